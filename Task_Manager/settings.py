@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tasks.metrics.RequestMetricsMiddleware',
+    'tasks.profiling.RequestProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,17 +69,26 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'Task_Manager.urls'
 
+_template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process in production; re-read
+            # them on every render in development so edits show up at once
+            'loaders': _template_loaders if DEBUG else [
+                ('django.template.loaders.cached.Loader', _template_loaders),
+            ],
         },
     },
 ]
@@ -92,9 +103,19 @@ WSGI_APPLICATION = 'Task_Manager.wsgi.application'
 DATABASE_URL = config('DATABASE_URL', default=None)
 DB_HOST = config('DB_HOST', default='localhost')
 
+# Connection reuse. Connections are kept open for DB_CONN_MAX_AGE seconds
+# (0 reconnects on every request) and pinged before a request reuses one.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=600, ssl_require=False),
+        'default': dj_database_url.config(
+            default=DATABASE_URL,
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+            ssl_require=False,
+        ),
     }
 elif DB_HOST and DB_HOST != 'localhost':
     # External MySQL configuration
@@ -106,6 +127,8 @@ elif DB_HOST and DB_HOST != 'localhost':
             'PASSWORD': config('DB_PASSWORD', default=''),
             'HOST': DB_HOST,
             'PORT': config('DB_PORT', default='3306'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
             'OPTIONS': {
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
                 'charset': 'utf8mb4',
@@ -119,9 +142,96 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                # WAL lets pages be read while another worker writes, and
+                # synchronous=NORMAL is still crash-safe in WAL mode
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                # Seconds a writer waits for the lock (busy_timeout) before
+                # "database is locked"; IMMEDIATE takes the lock when a
+                # transaction starts, where the wait applies, rather than
+                # failing when a read transaction later tries to write
+                'timeout': config('DB_SQLITE_TIMEOUT', default=20, cast=int),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# On PostgreSQL, hand connections out from psycopg's pool (per process)
+# instead: it suits ASGI workers, where persistent connections are not
+# shared between requests. Pooling replaces CONN_MAX_AGE.
+DB_POOL = config('DB_POOL', default=True, cast=bool)
+
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        # Seconds a request waits for a free connection before an error
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+
+# Cache
+# Local-memory by default. LocMem is per process, so with several gunicorn
+# workers set CACHE_BACKEND=file (or a shared backend) to keep cached task
+# statistics consistent across workers.
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'task-manager',
         }
     }
 
+# Rendered template fragments ({% cache ... using="templates" %}). They only
+# change with the templates, so keep them per process: a deploy (restart)
+# starts empty. Disabled in development so template edits show up at once.
+CACHES['templates'] = {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache' if DEBUG
+    else 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'task-manager-templates',
+    'TIMEOUT': None,
+    'OPTIONS': {'MAX_ENTRIES': 2000},
+}
+
+# Seconds a user's task statistics stay cached; saves and deletes invalidate sooner
+TASK_STATS_CACHE_TIMEOUT = config('TASK_STATS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Seconds a month of the task calendar stays cached; task changes in that month invalidate sooner
+TASK_CALENDAR_CACHE_TIMEOUT = config('TASK_CALENDAR_CACHE_TIMEOUT', default=86400, cast=int)
+
+
+# Requests running more database queries than this log a warning
+# (tasks/metrics.py). The default is above the most any view runs in the
+# query-count tests: deleting an account, at 18
+QUERY_BUDGET = config('QUERY_BUDGET', default=20, cast=int)
+
+# On-demand profiling of requests carrying a token from /profiles/
+# (tasks/profiling.py). Off, the middleware drops out of the stack.
+PROFILING = config('PROFILING', default=False, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / '.profiles'))
+PROFILE_INTERVAL = config('PROFILE_INTERVAL', default=0.005, cast=float)
+PROFILE_TOKEN_MAX_AGE = config('PROFILE_TOKEN_MAX_AGE', default=3600, cast=int)
+PROFILE_KEEP = config('PROFILE_KEEP', default=50, cast=int)
+
+# Seconds shared caches (a CDN or reverse proxy) may keep the anonymous home page
+HOME_PAGE_CACHE_TIMEOUT = config('HOME_PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Identifies the deployed code in page ETags, so a deploy never answers 304
+# with a page rendered by the old templates. Render sets RENDER_GIT_COMMIT.
+RELEASE_VERSION = config('RELEASE_VERSION', default=config('RENDER_GIT_COMMIT', default='dev'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -158,12 +268,33 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = '/static/'
+# static/css/app.css is built from assets/css/app.css by `manage.py build_css`
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# Whitenoise for serving static files on Render
-MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Whitenoise for serving static files on Render. collectstatic stores
+# compressed copies under content-hashed names, which whitenoise serves
+# with a far-future, immutable Cache-Control.
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # whitenoise's CompressedManifestStaticFilesStorage, tolerant of
+        # files that were not built (see Task_Manager/storage.py)
+        'BACKEND': 'Task_Manager.storage.StaticFilesStorage',
+    },
+}
+
+# Tailwind executable used by build_css; downloaded when empty
+TAILWIND_CLI = config('TAILWIND_CLI', default='')
+# SHA-256 a downloaded CLI must have: this platform's line in the pinned
+# release's sha256sums.txt (tasks/management/commands/build_css.py)
+TAILWIND_CLI_SHA256 = config('TAILWIND_CLI_SHA256', default='')
 
 # Auth redirects
 LOGIN_URL = '/user/login/'
@@ -171,6 +302,20 @@ LOGOUT_URL = '/user/logout/'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Sessions and the signed-in user. By default every signed-in request reads
+# django_session and auth_user. 'cached_db' sessions and a non-zero
+# AUTH_USER_CACHE_TIMEOUT serve both from CACHES['default'] instead; that
+# cache is per process unless CACHE_BACKEND=file, so with several workers
+# read RENDER_QUICKSTART.md first. 'signed_cookies' keeps the session in
+# the browser.
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[config('SESSION_BACKEND', default='db')]
+AUTHENTICATION_BACKENDS = ['user.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=0, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -21,6 +21,9 @@ from . import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:name>.folded', views.profile_stacks, name='profile-stacks'),
     path('user/', include('user.urls')),
     path('task/', include('tasks.urls')),
 ]
@@ -1,4 +1,66 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from tasks.http import conditional_page, make_etag, page_etag
+from tasks.metrics import render_metrics
+from tasks.profiling import TOKEN_HEADER, TOKEN_PARAM, list_profiles, make_token, profile_path
+
+
+@conditional_page(page_etag)
+def _personal_home(request):
+    return render(request, 'home/home.html')
+
 
 def home(request):
-    return render(request, 'home/home.html')
\ No newline at end of file
+    # With a session or flash messages the page is personal
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+        return _personal_home(request)
+
+    # Everyone else gets the same page, which a CDN or proxy may share.
+    # Vary: Cookie keeps a cache from handing it to a visitor who has since
+    # signed in; a CDN that keys only on the session and messages cookies
+    # still shares one copy. Browsers revalidate (max-age=0).
+    request.user = AnonymousUser()
+    etag = make_etag(settings.RELEASE_VERSION, 'home')
+    response = get_conditional_response(request, etag=etag) or render(request, 'home/home.html')
+    response.headers['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=0, s_maxage=settings.HOME_PAGE_CACHE_TIMEOUT)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def metrics(request):
+    """Request metrics of this worker process, for Prometheus; staff only."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profiles(request):
+    """A fresh profile token and the stored request profiles; staff only."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        raise PermissionDenied
+    context = {
+        'enabled': settings.PROFILING,
+        'token': make_token(request.user),
+        'token_param': TOKEN_PARAM,
+        'token_header': TOKEN_HEADER,
+        'token_minutes': settings.PROFILE_TOKEN_MAX_AGE // 60,
+        'profiles': list_profiles(),
+    }
+    return render(request, 'home/profiles.html', context)
+
+
+def profile_stacks(request, name):
+    """One profile's collapsed stacks, for flamegraph.pl or speedscope; staff only."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        raise PermissionDenied
+    path = profile_path(name)
+    if path is None:
+        raise Http404("No such profile.")
+    return FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8')
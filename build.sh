@@ -5,10 +5,14 @@ set -o errexit
 echo "Installing dependencies..."
 pip install -r requirements.txt
 
-echo "Collecting static files..."
-# Disable database checks during collectstatic
+# Disable database checks during build_css and collectstatic
 export DJANGO_SETTINGS_MODULE=Task_Manager.settings
 export DISABLE_SERVER_SIDE_CURSORS=1
+
+echo "Building CSS..."
+python manage.py build_css
+
+echo "Collecting static files..."
 python manage.py collectstatic --no-input --verbosity 0
 
 # Run migrations only if database is configured
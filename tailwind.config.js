@@ -0,0 +1,86 @@
+// Tailwind CSS v3 configuration, compiled by `python manage.py build_css`
+// (the standalone CLI, no Node needed) into static/css/app.css.
+/** @type {import('tailwindcss').Config} */
+module.exports = {
+    // Only classes found here end up in the stylesheet
+    content: [
+        './templates/**/*.html',
+        './*/templates/**/*.html',
+    ],
+    theme: {
+        extend: {
+            colors: {
+                primary: {
+                    50: '#f0f9ff',
+                    100: '#e0f2fe',
+                    200: '#bae6fd',
+                    300: '#7dd3fc',
+                    400: '#38bdf8',
+                    500: '#0ea5e9',
+                    600: '#0284c7',
+                    700: '#0369a1',
+                    800: '#075985',
+                    900: '#0c4a6e',
+                },
+                accent: {
+                    50: '#fdf2f8',
+                    100: '#fce7f3',
+                    200: '#fbcfe8',
+                    300: '#f9a8d4',
+                    400: '#f472b6',
+                    500: '#ec4899',
+                    600: '#db2777',
+                    700: '#be185d',
+                    800: '#9d174d',
+                    900: '#831843',
+                }
+            },
+            animation: {
+                'fade-in': 'fadeIn 0.8s ease-in-out',
+                'slide-up': 'slideUp 0.6s ease-out',
+                'slide-down': 'slideDown 0.4s ease-out',
+                'scale-in': 'scaleIn 0.5s ease-out',
+                'bounce-slow': 'bounce 3s infinite',
+                'float': 'float 6s ease-in-out infinite',
+                'gradient': 'gradient 8s ease infinite',
+            },
+            keyframes: {
+                fadeIn: {
+                    '0%': { opacity: '0' },
+                    '100%': { opacity: '1' },
+                },
+                slideUp: {
+                    '0%': { transform: 'translateY(40px)', opacity: '0' },
+                    '100%': { transform: 'translateY(0)', opacity: '1' },
+                },
+                slideDown: {
+                    '0%': { transform: 'translateY(-20px)', opacity: '0' },
+                    '100%': { transform: 'translateY(0)', opacity: '1' },
+                },
+                scaleIn: {
+                    '0%': { transform: 'scale(0.9)', opacity: '0' },
+                    '100%': { transform: 'scale(1)', opacity: '1' },
+                },
+                float: {
+                    '0%, 100%': { transform: 'translateY(0)' },
+                    '50%': { transform: 'translateY(-20px)' },
+                },
+                gradient: {
+                    '0%, 100%': { backgroundPosition: '0% 50%' },
+                    '50%': { backgroundPosition: '100% 50%' },
+                }
+            },
+            backgroundSize: {
+                '200%': '200%',
+            },
+            // hover:scale-102 on the calendar cells
+            scale: {
+                '102': '1.02',
+            }
+        }
+    },
+    // Bundled with the standalone CLI; styles the `prose` task descriptions
+    plugins: [
+        require('@tailwindcss/typography'),
+    ],
+}
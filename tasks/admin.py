@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Task
+from .models import Category, Task, TaskStats
 # Register your models here.
 
-admin.site.register(Task)
\ No newline at end of file
+admin.site.register(Category)
+admin.site.register(Task)
+admin.site.register(TaskStats)
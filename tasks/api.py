@@ -0,0 +1,298 @@
+"""
+JSON API for tasks, mounted under /task/api/.
+
+Uses the session login like the rest of the site, so writes need the
+CSRF token (X-CSRFToken header). Bulk writes run in one transaction with
+bulk_create/bulk_update; reads answer If-None-Match with 304.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET, require_http_methods, require_POST
+
+from .filters import filter_tasks, order_tasks
+from .models import Category, Task
+from .pagination import KeysetPaginator
+from .signals import invalidate_task_caches
+from .stats import apply_counter_changes, counter_changes, data_version
+
+WRITABLE_FIELDS = ('title', 'description', 'priority', 'due_date', 'status', 'category', 'is_completed')
+REQUIRED_FIELDS = ('title', 'priority', 'due_date', 'status')
+# Fields that take '' to clear them
+BLANK_FIELDS = ('description', 'category')
+FIELDS = ('id',) + WRITABLE_FIELDS + ('created_at', 'updated_at')
+# The values() the list reads for FIELDS
+LIST_VALUES = tuple('category__name' if name == 'category' else name for name in FIELDS)
+# Sent and received as their keys ('in_progress'), stored as integers
+CHOICE_FIELDS = {'priority': Task.Priority, 'status': Task.Status}
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_BULK = 1000
+BATCH_SIZE = 500
+
+
+class PayloadError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'separators': (',', ':')})
+
+
+def _error(message, status=400, **extra):
+    return _json({'error': message, **extra}, status=status)
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Authentication required.', status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def _list_etag(request):
+    # Every task write bumps the user's data version, like for the HTML pages
+    # (tasks.http); users at the same version must still get different tags
+    return _etag(request.user.pk, data_version(request.user), request.GET.urlencode())
+
+
+def _detail_etag(request, pk):
+    # The category name too: renaming it does not touch the task
+    changed = Task.objects.filter(pk=pk, user=request.user).values_list('updated_at', 'category__name').first()
+    return _etag(request.user.pk, pk, *changed) if changed else None
+
+
+def _is_id(value):
+    # JSON true/false arrive as bools, which are ints too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _api_values(data):
+    """Turn stored priority/status/category values into their API form."""
+    for name, choices in CHOICE_FIELDS.items():
+        data[name] = choices(data[name]).key
+    data['category'] = data['category'] or ''
+    return data
+
+
+def _task_dict(task):
+    data = {name: getattr(task, name) for name in FIELDS}
+    data['category'] = task.category.name if task.category else ''
+    return _api_values(data)
+
+
+def _load_body(request):
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise PayloadError({'body': 'Invalid JSON.'})
+
+
+def _clean(data, partial=False):
+    """Validate the writable fields in ``data`` and return them as model values."""
+    if not isinstance(data, dict):
+        raise PayloadError({'__all__': 'Expected an object.'})
+
+    cleaned, errors = {}, {}
+    for name in WRITABLE_FIELDS:
+        if name not in data:
+            if not partial and name in REQUIRED_FIELDS:
+                errors[name] = 'This field is required.'
+            continue
+        if data[name] == '' and name in BLANK_FIELDS:
+            cleaned[name] = ''
+            continue
+        if name in CHOICE_FIELDS:
+            try:
+                cleaned[name] = CHOICE_FIELDS[name].from_key(data[name])
+            except ValueError:
+                keys = ', '.join(choice.key for choice in CHOICE_FIELDS[name])
+                errors[name] = f"Must be one of {keys}."
+            continue
+        if name == 'category':
+            # A category name; resolved to the user's Category by _resolve_categories
+            max_length = Category._meta.get_field('name').max_length
+            if not isinstance(data[name], str):
+                errors[name] = 'Expected a string.'
+            elif len(Category.normalize(data[name])) > max_length:
+                errors[name] = f'Ensure this value has at most {max_length} characters.'
+            else:
+                cleaned[name] = Category.normalize(data[name])
+            continue
+        field = Task._meta.get_field(name)
+        try:
+            cleaned[name] = field.clean(data[name], None)
+        except ValidationError as e:
+            errors[name] = ' '.join(e.messages)
+    if errors:
+        raise PayloadError(errors)
+    return cleaned
+
+
+def _resolve_categories(user, items):
+    """Replace the category names in cleaned ``items`` with ``user``'s Category rows."""
+    names = [item['category'] for item in items if item.get('category')]
+    categories = Category.for_names(user, names) if names else {}
+    for item in items:
+        if 'category' in item:
+            item['category'] = categories.get(item['category'].lower())
+
+
+def _clean_many(key, items, partial=False):
+    """Clean every item, collecting errors by position under ``key``."""
+    cleaned, errors = [], {}
+    for i, item in enumerate(items):
+        try:
+            cleaned.append(_clean(item, partial))
+        except PayloadError as e:
+            errors[i] = e.errors
+    if errors:
+        raise PayloadError({key: errors})
+    return cleaned
+
+
+@api_login_required
+@require_GET
+@condition(etag_func=_list_etag)
+def task_list(request):
+    tasks, search_query, _ = filter_tasks(request.user, request.GET)
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+
+    paginator = KeysetPaginator(order_tasks(tasks, search_query), per_page=limit)
+    # Project only the API fields plus whatever the keyset cursor needs
+    paginator.queryset = paginator.queryset.values(
+        *LIST_VALUES, *(name for name in paginator.fields if name not in LIST_VALUES)
+    )
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+    return _json({
+        'results': [
+            _api_values({name: row[value] for name, value in zip(FIELDS, LIST_VALUES)})
+            for row in page
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@api_login_required
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+@condition(etag_func=_detail_etag)
+def task_detail(request, pk):
+    task = get_object_or_404(Task.objects.select_related('category'), pk=pk, user=request.user)
+
+    if request.method == 'DELETE':
+        task.delete()
+        return HttpResponse(status=204)
+
+    if request.method == 'PATCH':
+        try:
+            changes = _clean(_load_body(request), partial=True)
+        except PayloadError as e:
+            return _error('Invalid task.', errors=e.errors)
+        _resolve_categories(request.user, [changes])
+        for name, value in changes.items():
+            setattr(task, name, value)
+        task.save()
+
+    return _json(_task_dict(task))
+
+
+@api_login_required
+@require_POST
+def task_bulk(request):
+    """
+    Create, update and delete many tasks in one transaction. The body holds
+    any of ``create`` (task objects), ``update`` (partial task objects with
+    ``id``) and ``delete`` (ids); nothing is written if any item is invalid.
+    """
+    try:
+        body = _load_body(request)
+        if not isinstance(body, dict):
+            raise PayloadError({'body': 'Expected an object.'})
+        to_create = body.get('create') or []
+        to_update = body.get('update') or []
+        to_delete = body.get('delete') or []
+        if not all(isinstance(items, list) for items in (to_create, to_update, to_delete)):
+            raise PayloadError({'body': 'create, update and delete must be lists.'})
+        if len(to_create) + len(to_update) + len(to_delete) > MAX_BULK:
+            raise PayloadError({'body': f'At most {MAX_BULK} items per request.'})
+
+        created = _clean_many('create', to_create)
+        updates = {}
+        for i, item in enumerate(to_update):
+            if not isinstance(item, dict) or not _is_id(item.get('id')):
+                raise PayloadError({'update': {i: {'id': 'Expected an integer id.'}}})
+        for item, changes in zip(to_update, _clean_many('update', to_update, partial=True)):
+            updates[item['id']] = changes
+        if not all(_is_id(pk) for pk in to_delete):
+            raise PayloadError({'delete': 'Expected a list of integer ids.'})
+    except PayloadError as e:
+        return _error('Invalid bulk request.', errors=e.errors)
+
+    user = request.user
+    due_dates = set()
+    with transaction.atomic():
+        tasks = {}
+        if updates:
+            tasks = Task.objects.filter(user=user).select_for_update().in_bulk(list(updates))
+            missing = [pk for pk in updates if pk not in tasks]
+            if missing:
+                # Before anything is written: returning commits the block
+                return _error('Tasks not found.', status=404, ids=missing)
+        _resolve_categories(user, [*created, *updates.values()])
+
+        if updates:
+            now = timezone.now()
+            fields = {'updated_at'}
+            for pk, changes in updates.items():
+                task = tasks[pk]
+                due_dates.add(task.due_date)
+                for name, value in changes.items():
+                    setattr(task, name, value)
+                # bulk_update bypasses auto_now
+                task.updated_at = now
+                due_dates.add(task.due_date)
+                fields.update(changes)
+            Task.objects.bulk_update(tasks.values(), sorted(fields), batch_size=BATCH_SIZE)
+
+        new_tasks = Task.objects.bulk_create(
+            [Task(user=user, **values) for values in created], batch_size=BATCH_SIZE,
+        )
+        due_dates.update(task.due_date for task in new_tasks)
+
+        # bulk_create and bulk_update send no signals, so count them here
+        apply_counter_changes(counter_changes(
+            old=[task._loaded_counters for task in tasks.values()],
+            new=[task.counter_state() for task in [*tasks.values(), *new_tasks]],
+        ))
+
+        deleted = 0
+        if to_delete:
+            # Counted with one aggregate and one TaskStats update
+            deleted, _ = Task.objects.filter(user=user, id__in=to_delete).delete()
+
+    invalidate_task_caches(user.pk, *due_dates)
+    return _json({
+        'created': [task.pk for task in new_tasks],
+        'updated': list(tasks),
+        'deleted': deleted,
+    })
@@ -0,0 +1,111 @@
+"""
+Month grids for the calendar view.
+
+Each grid is built from one narrow query: per-day totals and the first few
+tasks of every day come from window functions, so descriptions and other
+unrendered columns are never loaded. Grids are cached per (user, year,
+month) and dropped by tasks.signals when a task due in that month changes.
+Recurring tasks' occurrences are expanded per request and merged in.
+"""
+import calendar
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Task
+
+TASKS_PER_DAY = 3
+
+
+def month_cache_key(user_id, year, month):
+    return f'tasks:calendar:{user_id}:{year}:{month}'
+
+
+def _month_rows(user_id, year, month):
+    last_day = calendar.monthrange(year, month)[1]
+    day = F('due_date')
+    return (
+        Task.objects
+        .filter(user_id=user_id, due_date__range=(date(year, month, 1), date(year, month, last_day)))
+        .annotate(
+            day_total=Window(Count('id'), partition_by=day),
+            day_position=Window(RowNumber(), partition_by=day, order_by=F('id').asc()),
+        )
+        .filter(day_position__lte=TASKS_PER_DAY)
+        .order_by()
+        .values('id', 'title', 'priority', 'is_completed', 'due_date', 'day_total', 'day_position')
+    )
+
+
+def _build_grid(year, month, rows):
+    days = {}
+    for row in sorted(rows, key=lambda row: (row['due_date'], row['day_position'])):
+        cell = days.setdefault(row['due_date'].day, {
+            'count': row['day_total'],
+            'more': row['day_total'] - TASKS_PER_DAY,
+            'tasks': [],
+        })
+        cell['tasks'].append({
+            'id': row['id'],
+            'title': row['title'],
+            'priority': Task.Priority(row['priority']).key,
+            'is_completed': row['is_completed'],
+        })
+
+    weeks = [
+        [dict(days.get(day, {'count': 0, 'more': 0, 'tasks': []}), day=day) if day else None for day in week]
+        for week in calendar.monthcalendar(year, month)
+    ]
+    return {'weeks': weeks, 'total': sum(cell['count'] for cell in days.values())}
+
+
+def month_grid(user_id, year, month):
+    """The calendar weeks for one month of ``user_id``'s tasks, with their total."""
+    key = month_cache_key(user_id, year, month)
+    grid = cache.get(key)
+    if grid is None:
+        grid = _build_grid(year, month, list(_month_rows(user_id, year, month)))
+        cache.set(key, grid, settings.TASK_CALENDAR_CACHE_TIMEOUT)
+    return grid
+
+
+async def amonth_grid(user_id, year, month):
+    key = month_cache_key(user_id, year, month)
+    grid = await cache.aget(key)
+    if grid is None:
+        rows = [row async for row in _month_rows(user_id, year, month)]
+        grid = _build_grid(year, month, rows)
+        await cache.aset(key, grid, settings.TASK_CALENDAR_CACHE_TIMEOUT)
+    return grid
+
+
+def with_occurrences(grid, occurrences):
+    """
+    ``grid`` with recurring tasks' open ``occurrences`` (tasks.recurrence)
+    added to their days. The grid itself is cached; occurrences are not.
+    """
+    if not occurrences:
+        return grid
+    by_day = {}
+    for occurrence in occurrences:
+        by_day.setdefault(occurrence['date'].day, []).append(occurrence)
+
+    weeks = []
+    for week in grid['weeks']:
+        cells = []
+        for cell in week:
+            extra = by_day.get(cell['day'], []) if cell else []
+            if extra:
+                count = cell['count'] + len(extra)
+                cell = dict(cell, count=count, more=count - TASKS_PER_DAY,
+                            tasks=(cell['tasks'] + extra)[:TASKS_PER_DAY])
+            cells.append(cell)
+        weeks.append(cells)
+    return {'weeks': weeks, 'total': grid['total'] + len(occurrences)}
+
+
+def invalidate_month_grids(user_id, *due_dates):
+    cache.delete_many({month_cache_key(user_id, d.year, d.month) for d in due_dates if d})
@@ -0,0 +1,32 @@
+from .models import Task
+from .search import rank_tasks, search_tasks
+
+# The keys forms, query strings and the API use for Task.Priority/Task.Status
+TASK_PRIORITIES = tuple(priority.key for priority in Task.Priority)
+TASK_STATUSES = tuple(status.key for status in Task.Status)
+
+
+def filter_tasks(user, params):
+    """``user``'s tasks, filtered by the task list ``search`` and ``status`` query parameters."""
+    queryset = Task.objects.filter(user=user)
+    search_query = params.get('search', '').strip()
+    status_filter = params.get('status', '').strip()
+
+    if search_query:
+        queryset = search_tasks(queryset, search_query, user.pk)
+
+    if status_filter == 'completed':
+        queryset = queryset.filter(is_completed=True)
+    elif status_filter in TASK_STATUSES:
+        queryset = queryset.filter(status=Task.Status.from_key(status_filter))
+    else:
+        status_filter = ''
+
+    return queryset, search_query, status_filter
+
+
+def order_tasks(queryset, search_query=''):
+    """Newest first, or best match first when searching."""
+    if search_query:
+        return rank_tasks(queryset, search_query)
+    return queryset.order_by('-created_at', '-id')
@@ -0,0 +1,115 @@
+"""
+Conditional GET for the HTML pages.
+
+Signed-in pages are sent with ``Cache-Control: private, no-cache``: the
+browser keeps its copy but revalidates it on every visit, and while the
+ETag still matches the view answers 304 without querying for or rendering
+the page. A page's ETag covers everything it shows: the release, the
+user's name, email and role, the CSRF cookie, the URL, the date (for "due
+today" and overdue markers) and whatever the view's etag function adds,
+usually the user's task data version (TaskStats.version). Pages with
+pending flash messages are always rendered.
+"""
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .models import Task
+from .stats import adata_version
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def _has_messages(request):
+    # len() loads the messages without marking them as shown
+    return bool(len(get_messages(request)))
+
+
+def _page_parts(request):
+    user = request.user
+    if user.is_authenticated:
+        identity = (user.pk, user.get_username(), user.get_full_name(), user.email, user.is_staff, user.is_superuser)
+    else:
+        identity = None
+    return (
+        settings.RELEASE_VERSION,
+        identity,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        request.get_full_path(),
+        timezone.now().date(),
+    )
+
+
+def page_etag(request, *parts):
+    """The ETag of ``request``'s page showing ``parts``, or None if it must be rendered."""
+    if _has_messages(request):
+        return None
+    return make_etag(*_page_parts(request), *parts)
+
+
+async def apage_etag(request, *parts):
+    if await sync_to_async(_has_messages)(request):
+        return None
+    request.user = await request.auser()
+    return make_etag(*_page_parts(request), *parts)
+
+
+async def tasks_page_etag(request, *args, **kwargs):
+    """ETag for pages built from all of the user's tasks."""
+    return await apage_etag(request, await adata_version(await request.auser()))
+
+
+async def task_page_etag(request, pk):
+    """ETag for one task's page; None (no 304) if the user has no such task."""
+    # The category name too: renaming it does not touch the task
+    changed = await (
+        Task.objects.filter(pk=pk, user=await request.auser())
+        .values_list('updated_at', 'category__name').afirst()
+    )
+    return await apage_etag(request, *changed) if changed else None
+
+
+def _finish(request, response, etag):
+    if etag and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(etag_func):
+    """
+    Answer GET/HEAD with 304 while ``etag_func(request, *args, **kwargs)``
+    matches If-None-Match, like django's condition(), but for sync and async
+    views (an async view takes an async etag function) and marking every
+    response private and no-cache.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                etag = None
+                if request.method in ('GET', 'HEAD'):
+                    etag = await etag_func(request, *args, **kwargs)
+                    if etag and (response := get_conditional_response(request, etag=etag)):
+                        return _finish(request, response, etag)
+                return _finish(request, await view(request, *args, **kwargs), etag)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                etag = None
+                if request.method in ('GET', 'HEAD'):
+                    etag = etag_func(request, *args, **kwargs)
+                    if etag and (response := get_conditional_response(request, etag=etag)):
+                        return _finish(request, response, etag)
+                return _finish(request, view(request, *args, **kwargs), etag)
+        return inner
+    return decorator
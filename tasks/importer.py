@@ -0,0 +1,152 @@
+"""
+Row readers and normalisation for the import_tasks command.
+
+Readers yield one dict per task without loading the whole file, and
+normalize_task turns a loosely formatted row from another tool into
+validated Task field values. A record that cannot be parsed is yielded as
+an InvalidRow, which normalize_task rejects like any other bad row; a file
+the reader cannot continue past raises ReadError.
+"""
+import csv
+import itertools
+import json
+from datetime import datetime
+
+from .filters import TASK_PRIORITIES, TASK_STATUSES
+from .models import Category, Task
+
+PRIORITY_ALIASES = {
+    '1': 'low', 'minor': 'low',
+    '2': 'medium', 'med': 'medium', 'normal': 'medium',
+    '3': 'high', 'urgent': 'high', 'critical': 'high',
+}
+STATUS_ALIASES = {
+    'to_do': 'todo', 'open': 'todo', 'new': 'todo', 'pending': 'todo',
+    'doing': 'in_progress', 'started': 'in_progress', 'progress': 'in_progress',
+    'done': 'completed', 'complete': 'completed', 'closed': 'completed',
+}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+MAX_LENGTHS = {'title': 200, 'category': 100}
+
+
+class ReadError(ValueError):
+    """The file is malformed in a way the reader cannot skip past."""
+
+
+class InvalidRow:
+    """A record that could not be parsed; ``error`` says why."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def read_csv(file):
+    reader = csv.DictReader(file)
+    try:
+        yield from reader
+    except csv.Error as e:
+        raise ReadError(f"Line {reader.line_num}: {e}")
+
+
+def read_ndjson(file):
+    for number, line in enumerate(file, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield InvalidRow(f"line {number} is not valid JSON ({e})")
+
+
+def read_json(file, buffer_size=1 << 16, max_item_size=1 << 20):
+    """
+    Yield the objects of a top-level JSON array, decoding it piece by piece.
+    An item that is not valid JSON, or longer than ``max_item_size``
+    characters, raises ReadError: the rest of the array cannot be found.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(buffer_size).lstrip()
+    if not buffer.startswith('['):
+        raise ReadError("Expected a JSON array of task objects.")
+    buffer = buffer[1:]
+
+    for number in itertools.count(1):
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+                break
+            except json.JSONDecodeError as e:
+                # Usually just cut off by the buffer; read on up to the cap
+                more = file.read(buffer_size) if len(buffer) <= max_item_size else ''
+                if not more:
+                    if len(buffer) > max_item_size:
+                        raise ReadError(f"Item {number} is not valid JSON or longer than {max_item_size} characters.")
+                    raise ReadError(f"Item {number} is not valid JSON ({e}).")
+                buffer += more
+        yield item
+        buffer = buffer[end:]
+        if len(buffer) < buffer_size:
+            buffer += file.read(buffer_size)
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'ndjson': read_ndjson}
+
+
+def _text(row, name):
+    value = row.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def normalize_task(row, date_format=None):
+    """
+    Return validated Task field values for ``row`` or raise ValueError.
+    Dates are ISO 8601 unless ``date_format`` (strptime syntax) is given.
+    ``category`` is left as a name for the caller to resolve per user.
+    """
+    if isinstance(row, InvalidRow):
+        raise ValueError(row.error)
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+
+    title = _text(row, 'title')
+    if not title:
+        raise ValueError("title is required")
+
+    priority = _text(row, 'priority').lower() or 'medium'
+    priority = PRIORITY_ALIASES.get(priority, priority)
+    if priority not in TASK_PRIORITIES:
+        raise ValueError(f"unknown priority {priority!r}")
+
+    status = _text(row, 'status').lower().replace(' ', '_').replace('-', '_') or 'todo'
+    status = STATUS_ALIASES.get(status, status)
+    if status not in TASK_STATUSES:
+        raise ValueError(f"unknown status {status!r}")
+
+    due_date = _text(row, 'due_date')
+    if not due_date:
+        raise ValueError("due_date is required")
+    try:
+        if date_format:
+            due_date = datetime.strptime(due_date, date_format).date()
+        else:
+            # Accept plain dates and full timestamps
+            due_date = datetime.fromisoformat(due_date).date()
+    except ValueError:
+        raise ValueError(f"invalid due_date {due_date!r}")
+
+    completed = _text(row, 'is_completed').lower()
+    task = {
+        'title': title,
+        'description': _text(row, 'description'),
+        'priority': Task.Priority.from_key(priority),
+        'due_date': due_date,
+        'status': Task.Status.from_key(status),
+        'category': Category.normalize(_text(row, 'category')),
+        'is_completed': completed in TRUE_VALUES if completed else status == 'completed',
+    }
+    for name, limit in MAX_LENGTHS.items():
+        if len(task[name]) > limit:
+            raise ValueError(f"{name} is longer than {limit} characters")
+    return task
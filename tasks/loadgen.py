@@ -0,0 +1,102 @@
+"""
+Load generation shared by the bench and loadtest commands.
+
+run_concurrently() calls a request function from a pool of threads and
+summarises the samples it returns: ``(seconds, status, queries)``, where
+queries is read from the Server-Timing header RequestMetricsMiddleware
+sets, or None. fetch_url() makes such a request against a running server,
+and session_cookie() logs a user in for it through the shared database.
+"""
+import math
+import re
+import statistics
+import threading
+import time
+import urllib.request
+from urllib.error import HTTPError
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(math.ceil(len(ordered) * pct / 100) - 1, 0)]
+
+
+def query_count(server_timing):
+    match = QUERIES_RE.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def session_cookie(user):
+    """A session cookie value for ``user``; servers using this database accept it."""
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def fetch_url(request):
+    """Send the urllib ``request`` and return its sample."""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status, timing = response.status, response.headers.get('Server-Timing')
+    except HTTPError as exc:
+        status, timing = exc.code, None
+    except OSError:
+        status, timing = None, None
+    return time.perf_counter() - start, status, query_count(timing)
+
+
+def run_concurrently(fetch, total, concurrency):
+    """
+    Call ``fetch(i)`` for i in range(``total``) from ``concurrency`` threads
+    and summarise the samples; None if ``total`` is 0. A sample whose status
+    is not 200 counts as an error.
+    """
+    if total < 1:
+        return None
+    samples = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                sample = fetch(i)
+                with lock:
+                    samples.append(sample)
+        finally:
+            # Each thread opened its own database connection
+            connections.close_all()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    queries = [count for _, _, count in samples if count is not None]
+    return {
+        'requests': total,
+        'errors': sum(status != 200 for _, status, _ in samples),
+        'requests_per_sec': round(total / wall, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 1),
+        'queries_per_request': round(statistics.fmean(queries), 1) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from tasks.loadgen import fetch_url, query_count, run_concurrently, session_cookie
+
+# name -> (URL name, query string)
+TARGETS = {
+    'user_tasks': ('tasks:user_tasks', ''),
+    'search': ('tasks:user_tasks', '?search=report'),
+    'calendar': ('tasks:calendar', ''),
+    'dashboard': ('user:user-dashboard', ''),
+    'admin_profile': ('user:admin-profile', ''),
+}
+STAFF_TARGETS = {'admin_profile'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main pages as the users created by seed_perf_data, with "
+        "concurrent clients, either in this process through the test client or "
+        "against a running server (--url). Prints p50/p95/p99 latency, queries "
+        "per request (from the Server-Timing header) and throughput as JSON; save "
+        "it with --output and pass it to --compare on the next commit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*',
+                            help=f"Pages to benchmark (default: all of {', '.join(TARGETS)}).")
+        parser.add_argument('--url', help="Base URL of a running server sharing this database "
+                                          "(default: requests go through the test client in this process).")
+        parser.add_argument('--prefix', default='perf', help="seed_perf_data username prefix (default: perf).")
+        parser.add_argument('--users', type=int, default=20, help="Seeded users to spread requests over (default: 20).")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per page (default: 200).")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per page first (default: 10).")
+        parser.add_argument('--label', default=settings.RELEASE_VERSION,
+                            help="Name of this run, e.g. the commit (default: RELEASE_VERSION).")
+        parser.add_argument('--output', help="Also write the JSON to this file.")
+        parser.add_argument('--compare', help="JSON from an earlier run to report changes against.")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['concurrency'], options['requests']) < 1:
+            raise CommandError("--users, --concurrency and --requests must be positive.")
+        if options['warmup'] < 0:
+            raise CommandError("--warmup cannot be negative.")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+        targets = options['targets'] or list(TARGETS)
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown pages: {', '.join(sorted(unknown))} (choose from {', '.join(TARGETS)}).")
+
+        prefix = options['prefix']
+        users = list(
+            User.objects.filter(username__startswith=f'{prefix}-', is_staff=False)
+            .order_by('username')[:options['users']]
+        )
+        staff = User.objects.filter(username=f'{prefix}-staff').first()
+        if not users or (staff is None and STAFF_TARGETS & set(targets)):
+            raise CommandError(f"No '{prefix}-' users found; run seed_perf_data first.")
+
+        # Log in through the test client; a server using this database accepts the cookies
+        sessions = [session_cookie(user) for user in users]
+        staff_sessions = [session_cookie(staff)] if staff else []
+
+        results = {}
+        # The test client identifies itself as 'testserver'
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name in targets:
+                url_name, query = TARGETS[name]
+                path = reverse(url_name) + query
+                cookies = staff_sessions if name in STAFF_TARGETS else sessions
+                self.run(path, cookies, options['warmup'], options['concurrency'], options['url'])
+                results[name] = self.run(path, cookies, options['requests'], options['concurrency'], options['url'])
+                results[name]['path'] = path
+
+        report = {
+            'label': options['label'],
+            'server': options['url'] or 'in-process',
+            'database': connection.vendor,
+            'users': len(users),
+            'concurrency': options['concurrency'],
+            'targets': results,
+        }
+        if baseline:
+            report['baseline'] = baseline.get('label')
+            for name, result in results.items():
+                before = baseline.get('targets', {}).get(name)
+                if before:
+                    result['change'] = self.change(before, result)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def run(self, path, cookies, total, concurrency, base_url=None):
+        """Make ``total`` GETs of ``path`` from ``concurrency`` threads, rotating through ``cookies``."""
+        clients = threading.local()
+
+        def fetch(i):
+            cookie = cookies[i % len(cookies)]
+            if base_url:
+                return fetch_url(urllib.request.Request(
+                    base_url.rstrip('/') + path, headers={'Cookie': f'{settings.SESSION_COOKIE_NAME}={cookie}'},
+                ))
+            # One test client per thread and session
+            if not hasattr(clients, 'by_cookie'):
+                clients.by_cookie = {}
+            if cookie not in clients.by_cookie:
+                clients.by_cookie[cookie] = Client()
+                clients.by_cookie[cookie].cookies[settings.SESSION_COOKIE_NAME] = cookie
+            return self.fetch_local(clients.by_cookie[cookie], path)
+
+        return run_concurrently(fetch, total, concurrency)
+
+    def fetch_local(self, client, path):
+        start = time.perf_counter()
+        response = client.get(path, secure=True)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code, query_count(response.headers.get('Server-Timing'))
+
+    def change(self, before, after):
+        """Relative change of the headline numbers against an earlier run."""
+        change = {}
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_sec'):
+            if before.get(key):
+                change[key] = f'{(after[key] - before[key]) / before[key]:+.1%}'
+        if before.get('queries_per_request') is not None and after['queries_per_request'] is not None:
+            change['queries_per_request'] = round(after['queries_per_request'] - before['queries_per_request'], 1)
+        return change
@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Engine, RequestContext, engines
+from django.test import RequestFactory, override_settings
+
+DEFAULT_TEMPLATES = [
+    'home/home.html',
+    'user/login.html',
+    'user/dashboard.html',
+    'tasks/user_tasks.html',
+    'tasks/calendar.html',
+    'tasks/create_task.html',
+]
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time template rendering three ways: loading and compiling on every render "
+        "(no cached loader), with the cached loader but empty fragment caches, and "
+        "with warm fragment caches. Views' context is left empty, so this measures "
+        "the templates themselves (base layout, url tags, fragments), not the data. "
+        "Uses the production setup (cached loader, in-memory fragment cache, no "
+        "template debug info) whatever DEBUG is."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('templates', nargs='*', help="Templates to render (default: the main pages).")
+        parser.add_argument('--username', help="Render as this user (default: anonymous).")
+        parser.add_argument('--iterations', type=int, default=200, help="Renders per template and mode.")
+
+    def handle(self, *args, **options):
+        user = AnonymousUser()
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist.")
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be positive.")
+
+        request = RequestFactory().get('/')
+        request.user = user
+        # Under DEBUG the configured engine has no cached loader and the
+        # templates cache is a DummyCache, which would make the columns equal
+        configured = engines['django'].engine
+        engine_options = dict(
+            dirs=configured.dirs, app_dirs=False, context_processors=configured.context_processors,
+            debug=False, libraries=configured.libraries,
+        )
+        uncached = Engine(loaders=UNCACHED_LOADERS, **engine_options)
+        cached = Engine(loaders=[('django.template.loaders.cached.Loader', UNCACHED_LOADERS)], **engine_options)
+        templates_cache = {
+            **settings.CACHES['templates'], 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+
+        with override_settings(CACHES={**settings.CACHES, 'templates': templates_cache}):
+            fragments = caches['templates']
+            self.stdout.write(f"{'template':<28}{'compile+render':>16}{'cold fragments':>16}{'warm fragments':>16}")
+            for name in options['templates'] or DEFAULT_TEMPLATES:
+                compile_and_render = self.time(
+                    lambda: uncached.get_template(name).render(RequestContext(request, {})),
+                    fragments.clear, options['iterations'],
+                )
+                template = cached.get_template(name)
+                render = lambda: template.render(RequestContext(request, {}))
+                cold = self.time(render, fragments.clear, options['iterations'])
+                warm = self.time(render, None, options['iterations'])
+                self.stdout.write(f"{name:<28}{compile_and_render:>13.2f} ms{cold:>13.2f} ms{warm:>13.2f} ms")
+
+    def time(self, render, before_each, iterations):
+        """Median milliseconds per ``render()`` call, after one warm-up call."""
+        render()
+        timings = []
+        for _ in range(iterations):
+            if before_each:
+                before_each()
+            started = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import platform
+import stat
+import subprocess
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+TAILWIND_VERSION = 'v3.4.17'
+DOWNLOAD_URL = 'https://github.com/tailwindlabs/tailwindcss/releases/download/{version}/{asset}'
+# Standalone CLI builds: (system, machine) -> release asset
+CLI_ASSETS = {
+    ('linux', 'x86_64'): 'tailwindcss-linux-x64',
+    ('linux', 'aarch64'): 'tailwindcss-linux-arm64',
+    ('darwin', 'x86_64'): 'tailwindcss-macos-x64',
+    ('darwin', 'arm64'): 'tailwindcss-macos-arm64',
+    ('windows', 'amd64'): 'tailwindcss-windows-x64.exe',
+}
+
+
+def sha256(path):
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile assets/css/app.css into static/css/app.css with the Tailwind standalone "
+        "CLI, keeping only the classes the templates use and minifying the result. "
+        "Runs before collectstatic in build.sh."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cli', default=settings.TAILWIND_CLI,
+                            help="Use this Tailwind executable instead of downloading one (TAILWIND_CLI).")
+        parser.add_argument('--watch', action='store_true',
+                            help="Rebuild whenever a template or the source CSS changes (development).")
+
+    def handle(self, *args, **options):
+        base = settings.BASE_DIR
+        output = base / 'static' / 'css' / 'app.css'
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        command = [
+            options['cli'] or self.download_cli(),
+            '--config', str(base / 'tailwind.config.js'),
+            '--input', str(base / 'assets' / 'css' / 'app.css'),
+            '--output', str(output),
+        ]
+        command.append('--watch' if options['watch'] else '--minify')
+        try:
+            # Tailwind resolves the config's content globs against the working directory
+            subprocess.run(command, cwd=base, check=True)
+        except FileNotFoundError:
+            raise CommandError(f"Tailwind CLI not found: {command[0]}")
+        except subprocess.CalledProcessError as exc:
+            raise CommandError(f"Tailwind exited with status {exc.returncode}.")
+        except KeyboardInterrupt:
+            return
+
+        if not options['watch']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output} ({output.stat().st_size // 1024} KiB)"))
+
+    def download_cli(self):
+        """
+        Path of the pinned standalone CLI, downloaded on first use. It is only
+        run if its SHA-256 is TAILWIND_CLI_SHA256, the digest of this
+        platform's asset in the release's sha256sums.txt.
+        """
+        key = (platform.system().lower(), platform.machine().lower())
+        asset = CLI_ASSETS.get(key)
+        if asset is None:
+            raise CommandError(f"No Tailwind standalone build for {key[0]}/{key[1]}; pass --cli.")
+        expected = settings.TAILWIND_CLI_SHA256.strip().lower()
+        if not expected:
+            raise CommandError(
+                f"Set TAILWIND_CLI_SHA256 to the SHA-256 of {asset} listed in the {TAILWIND_VERSION} "
+                f"release's sha256sums.txt, or pass --cli."
+            )
+
+        path = settings.BASE_DIR / '.tailwind' / TAILWIND_VERSION / asset
+        if path.exists():
+            # Checked on every build, not just after the download
+            if sha256(path) != expected:
+                raise CommandError(f"{path} does not match TAILWIND_CLI_SHA256; delete it to download it again.")
+            return str(path)
+
+        url = DOWNLOAD_URL.format(version=TAILWIND_VERSION, asset=asset)
+        self.stdout.write(f"Downloading {url}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + '.part')
+        try:
+            urllib.request.urlretrieve(url, partial)
+        except OSError as exc:
+            partial.unlink(missing_ok=True)
+            raise CommandError(f"Could not download the Tailwind CLI ({exc}); pass --cli.")
+        actual = sha256(partial)
+        if actual != expected:
+            partial.unlink()
+            raise CommandError(f"{url} has SHA-256 {actual}, not TAILWIND_CLI_SHA256 ({expected}); not running it.")
+        partial.chmod(partial.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        os.replace(partial, path)
+        return str(path)
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.importer import READERS, ReadError, normalize_task
+from tasks.models import Category, Task
+from tasks.signals import invalidate_task_caches
+from tasks.stats import apply_counter_changes, counter_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks for one user from a CSV, JSON or NDJSON file, streaming the "
+        "file and inserting in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin.")
+        parser.add_argument('--user', required=True, help="Username that will own the tasks.")
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help="Input format (default: from the file extension, csv for stdin).")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Rows inserted per bulk_create and transaction (default: 2000).")
+        parser.add_argument('--date-format',
+                            help="strptime format of due_date, e.g. %%d/%%m/%%Y (default: ISO 8601).")
+        parser.add_argument('--strict', action='store_true',
+                            help="Abort on the first invalid row instead of skipping it.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate the file without writing anything.")
+        parser.add_argument('--progress-every', type=int, default=50000,
+                            help="Rows between progress lines (default: 50000).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        path = options['path']
+        fmt = options['format'] or (os.path.splitext(path)[1].lstrip('.').lower() if path != '-' else 'csv')
+        if fmt not in READERS:
+            raise CommandError(f"Cannot tell the format of '{path}'; pass --format.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if options['progress_every'] < 1:
+            raise CommandError("--progress-every must be positive.")
+
+        if path == '-':
+            self.import_rows(user, READERS[fmt](sys.stdin), options)
+        else:
+            with open(path, newline='', encoding='utf-8-sig') as file:
+                self.import_rows(user, READERS[fmt](file), options)
+
+    def import_rows(self, user, rows, options):
+        batch_size = options['batch_size']
+        batch, months = [], set()
+        # Lowercased name -> Category, filled as new names appear
+        categories = {}
+        read = imported = skipped = 0
+        started = time.monotonic()
+
+        def flush():
+            nonlocal imported
+            if not options['dry_run']:
+                with transaction.atomic():
+                    names = {values['category'] for values in batch} - {''}
+                    missing = [name for name in names if name.lower() not in categories]
+                    if missing:
+                        categories.update(Category.for_names(user, missing))
+                    tasks = []
+                    for values in batch:
+                        category = categories.get(values.pop('category').lower())
+                        tasks.append(Task(user=user, category=category, **values))
+                    Task.objects.bulk_create(tasks, batch_size=batch_size)
+                    apply_counter_changes(counter_changes(new=[task.counter_state() for task in tasks]))
+            imported += len(batch)
+            batch.clear()
+
+        try:
+            for read, row in enumerate(rows, start=1):
+                try:
+                    values = normalize_task(row, options['date_format'])
+                except ValueError as e:
+                    if options['strict']:
+                        raise CommandError(f"Row {read}: {e}")
+                    skipped += 1
+                    if skipped <= 20:
+                        self.stderr.write(f"Row {read} skipped: {e}")
+                    continue
+
+                batch.append(values)
+                months.add((values['due_date'].year, values['due_date'].month))
+                if len(batch) >= batch_size:
+                    flush()
+                if read % options['progress_every'] == 0:
+                    self.stdout.write(self.progress(read, imported, skipped, started))
+            if batch:
+                flush()
+        except ReadError as e:
+            # Earlier batches are committed; say how far the import got
+            verb = "validated" if options['dry_run'] else "imported"
+            raise CommandError(f"{e} Stopped after {read} rows; {imported} tasks were {verb} before it.")
+        finally:
+            if imported and not options['dry_run']:
+                invalidate_task_caches(user.pk, *(date(year, month, 1) for year, month in months))
+
+        verb = "Validated" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {imported} tasks for {user.username}; "
+            + self.progress(read, imported, skipped, started)
+        ))
+
+    def progress(self, read, imported, skipped, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        return (
+            f"{read} rows read, {imported} imported, {skipped} skipped "
+            f"in {elapsed:.1f}s ({read / elapsed:,.0f} rows/s)"
+        )
@@ -0,0 +1,80 @@
+import json
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+
+from tasks.loadgen import fetch_url, run_concurrently, session_cookie
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GETs at one or more running servers (e.g. gunicorn WSGI "
+        "and uvicorn ASGI on different ports) and compare their throughput. With "
+        "--write-every, some requests instead toggle a task through the JSON API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True, dest='urls',
+                            help="Base URL of a running server; repeat to compare several.")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request (repeatable, default: the task read endpoints).")
+        parser.add_argument('--username', required=True,
+                            help="User to authenticate as. A session is created in the shared database.")
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=500, help="Requests per path per server.")
+        parser.add_argument('--write-every', type=int, default=0,
+                            help="Make every Nth request a PATCH to one of the user's tasks (default: reads only).")
+
+    def handle(self, *args, **options):
+        if min(options['concurrency'], options['requests']) < 1:
+            raise CommandError("--concurrency and --requests must be positive.")
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session_cookie(user)}"
+
+        write = None
+        if options['write_every'] > 0:
+            task = Task.objects.filter(user=user).first()
+            if task is None:
+                raise CommandError(f"User '{options['username']}' has no task to write to.")
+            # A CSRF cookie and matching token, as a browser would send them
+            request = HttpRequest()
+            token = get_token(request)
+            write = {
+                'every': options['write_every'],
+                'path': f'/task/api/tasks/{task.pk}/',
+                'cookie': f"{cookie}; {settings.CSRF_COOKIE_NAME}={request.META['CSRF_COOKIE']}",
+                'token': token,
+            }
+
+        paths = options['paths'] or ['/task/my-tasks/', '/task/calendar/', '/user/dashboard/']
+        results = {}
+        for base_url in options['urls']:
+            results[base_url] = {
+                path: self.run(base_url.rstrip('/'), path, cookie, options['concurrency'], options['requests'], write)
+                for path in paths
+            }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, base_url, path, cookie, concurrency, total, write=None):
+        def fetch(i):
+            if write and i % write['every'] == write['every'] - 1:
+                request = urllib.request.Request(
+                    base_url + write['path'], method='PATCH',
+                    data=json.dumps({'is_completed': bool(i % 2)}).encode(),
+                    headers={'Cookie': write['cookie'], 'X-CSRFToken': write['token'],
+                             'Content-Type': 'application/json'},
+                )
+            else:
+                request = urllib.request.Request(base_url + path, headers={'Cookie': cookie})
+            return fetch_url(request)
+
+        return run_concurrently(fetch, total, concurrency)
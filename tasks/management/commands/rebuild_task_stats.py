@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.stats import invalidate_user_task_stats, rebuild_task_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalised TaskStats counters from the tasks table and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames',
+                            help="Only rebuild this user's counters (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Users recomputed per query (default: 1000).")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        batch_size = options['batch_size']
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            # Walk users by id so each batch is an index range
+            batch = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not batch:
+                break
+            fixed = rebuild_task_stats(batch)
+            if fixed:
+                for user_id in batch:
+                    invalidate_user_task_stats(user_id)
+            checked += len(batch)
+            repaired += fixed
+            last_id = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, repaired {repaired} task stat rows."
+        ))
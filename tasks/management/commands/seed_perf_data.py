@@ -0,0 +1,136 @@
+import math
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.models import Category, Task
+from tasks.stats import invalidate_user_task_stats, rebuild_task_stats
+
+WORDS = (
+    'report', 'invoice', 'meeting', 'review', 'deploy', 'budget', 'client', 'design',
+    'release', 'backup', 'planning', 'research', 'hiring', 'training', 'audit', 'survey',
+)
+CATEGORY_NAMES = ('Work', 'Personal', 'Errands', 'Health', 'Finance', 'Study', 'Home', 'Travel')
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a deterministic data set for benchmarks: users named <prefix>-00000... "
+        "with task counts spread log-uniformly between --min-tasks and --max-tasks, "
+        "plus one staff user <prefix>-staff. The same --seed and --start give the "
+        "same data. All users share --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help="Regular users to create (default: 100).")
+        parser.add_argument('--min-tasks', type=int, default=5, help="Fewest tasks per user (default: 5).")
+        parser.add_argument('--max-tasks', type=int, default=2000, help="Most tasks per user (default: 2000).")
+        parser.add_argument('--categories', type=int, default=5,
+                            help=f"Categories per user, up to {len(CATEGORY_NAMES)} (default: 5).")
+        parser.add_argument('--completed', type=float, default=0.4,
+                            help="Share of completed tasks (default: 0.4).")
+        parser.add_argument('--due-days', type=int, default=90,
+                            help="Due dates fall within this many days either side of --start (default: 90).")
+        parser.add_argument('--start', type=date.fromisoformat, default=None,
+                            help="Centre of the due dates, YYYY-MM-DD (default: today).")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed (default: 1).")
+        parser.add_argument('--prefix', default='perf', help="Username prefix (default: perf).")
+        parser.add_argument('--password', default='perf-pass', help="Password of every seeded user.")
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete existing users with the prefix first.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Rows per bulk_create (default: 2000).")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--users and --batch-size must be positive.")
+        if not 0 < options['min_tasks'] <= options['max_tasks']:
+            raise CommandError("Need 0 < --min-tasks <= --max-tasks.")
+        if not 0 <= options['completed'] <= 1:
+            raise CommandError("--completed must be between 0 and 1.")
+
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=f'{prefix}-')
+        if options['clear']:
+            deleted = existing.count()
+            existing.delete()
+            self.stdout.write(f"Deleted {deleted} '{prefix}' users.")
+        elif existing.exists():
+            raise CommandError(f"Users starting with '{prefix}-' already exist; pass --clear or another --prefix.")
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.create_users(options)
+            categories = self.create_categories(users, options['categories'])
+            total = self.create_tasks(rng, users, categories, options)
+        user_ids = [user.pk for user in users]
+        for offset in range(0, len(user_ids), 1000):
+            # bulk_create skips the signals that keep the counters
+            rebuild_task_stats(user_ids[offset:offset + 1000])
+        for user_id in user_ids:
+            invalidate_user_task_stats(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users ({prefix}-staff is staff) and {total} tasks "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        # Hashing once keeps seeding fast; every user gets the same password
+        password = make_password(options['password'])
+        users = [
+            User(username=f'{prefix}-{i:05d}', email=f'{prefix}-{i:05d}@example.com', password=password)
+            for i in range(options['users'])
+        ]
+        users.append(User(username=f'{prefix}-staff', email=f'{prefix}-staff@example.com',
+                          password=password, is_staff=True))
+        User.objects.bulk_create(users, batch_size=options['batch_size'])
+        # Not every backend returns the new ids; read them back
+        return list(User.objects.filter(username__startswith=f'{prefix}-').order_by('username'))
+
+    def create_categories(self, users, per_user):
+        names = CATEGORY_NAMES[:max(per_user, 0)]
+        Category.objects.bulk_create([Category(user=user, name=name) for user in users for name in names])
+        categories = {}
+        for category in Category.objects.filter(user__in=users).order_by('id'):
+            categories.setdefault(category.user_id, []).append(category)
+        return categories
+
+    def create_tasks(self, rng, users, categories, options):
+        start = options['start'] or date.today()
+        low, high = math.log(options['min_tasks']), math.log(options['max_tasks'])
+        batch, total = [], 0
+        for user in users:
+            # Log-uniform: many light users and a few heavy ones
+            count = round(math.exp(rng.uniform(low, high)))
+            choices = categories.get(user.pk, [])
+            for _ in range(count):
+                completed = rng.random() < options['completed']
+                words = rng.sample(WORDS, 3)
+                batch.append(Task(
+                    user=user,
+                    title=' '.join(words).capitalize(),
+                    description=' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    priority=rng.choice(Task.Priority.values),
+                    status=Task.Status.COMPLETED if completed else rng.choice(
+                        [Task.Status.TODO, Task.Status.IN_PROGRESS]),
+                    is_completed=completed,
+                    due_date=start + timedelta(days=rng.randint(-options['due_days'], options['due_days'])),
+                    # A quarter of the tasks have no category
+                    category=rng.choice(choices) if choices and rng.random() < 0.75 else None,
+                ))
+                if len(batch) >= options['batch_size']:
+                    Task.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+        if batch:
+            Task.objects.bulk_create(batch)
+            total += len(batch)
+        return total
@@ -0,0 +1,169 @@
+"""
+Per-view request metrics.
+
+RequestMetricsMiddleware times every request that resolves to a view and
+counts the database queries it runs, with their time. Each response gets a
+``Server-Timing`` header (shown in the browser's network panel), totals
+are exposed in Prometheus text format at /metrics/ for staff, and a view
+running more than QUERY_BUDGET queries logs a warning.
+
+Queries are counted by an execute wrapper that every database connection
+gets (TasksConfig.ready() imports this module before any is opened). It
+finds the current request through a context variable, so queries an async
+view runs in sync_to_async threads are counted too. Totals are kept per
+worker process and labelled with its pid.
+"""
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from inspect import iscoroutinefunction
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Sent on every (re)connect of a persistent connection; install once
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _inc(name, labels, value=1):
+    key = (name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(name, labels, value):
+    key = (name, labels)
+    with _lock:
+        buckets, total, count = _histograms.get(key, ([0] * len(DURATION_BUCKETS), 0.0, 0))
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        _histograms[key] = (buckets, total + value, count + 1)
+
+
+def _record(request, response, stats, elapsed):
+    match = request.resolver_match
+    if match is None:
+        # Static files, 404s and redirects from CommonMiddleware
+        return
+    view = match.view_name
+    _inc('taskmanager_requests_total', (('view', view), ('method', request.method), ('status', str(response.status_code))))
+    _observe('taskmanager_request_duration_seconds', (('view', view),), elapsed)
+    _inc('taskmanager_db_queries_total', (('view', view),), stats.queries)
+    _inc('taskmanager_db_duration_seconds_total', (('view', view),), stats.db_time)
+
+    if stats.queries > settings.QUERY_BUDGET:
+        _inc('taskmanager_query_budget_exceeded_total', (('view', view),))
+        logger.warning(
+            "%s %s ran %d queries (budget %d)",
+            request.method, request.path, stats.queries, settings.QUERY_BUDGET,
+        )
+
+
+def _finish(request, response, stats, started):
+    elapsed = time.perf_counter() - started
+    response.headers['Server-Timing'] = (
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+        f'total;dur={elapsed * 1000:.1f}'
+    )
+    _record(request, response, stats, elapsed)
+    return response
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, stats, started)
+
+
+def _format(name, labels, value):
+    labels = (('pid', str(os.getpid())),) + labels
+    text = ','.join(f'{key}="{val}"' for key, val in labels)
+    return f'{name}{{{text}}} {value}'
+
+
+def render_metrics():
+    """This process's totals in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(b), s, c)) for key, (b, s, c) in _histograms.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# TYPE {name} counter')
+        lines.append(_format(name, labels, value))
+    for (name, labels), (buckets, total, count) in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# TYPE {name} histogram')
+        for bound, bucket in zip(DURATION_BUCKETS, buckets):
+            lines.append(_format(f'{name}_bucket', labels + (('le', f'{bound:g}'),), bucket))
+        lines.append(_format(f'{name}_bucket', labels + (('le', '+Inf'),), count))
+        lines.append(_format(f'{name}_sum', labels, total))
+        lines.append(_format(f'{name}_count', labels, count))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,62 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+STATUSES = ('todo', 'in_progress', 'completed')
+PRIORITIES = ('low', 'medium', 'high')
+BATCH_SIZE = 1000
+
+
+def populate_stats(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Task = apps.get_model('tasks', 'Task')
+    TaskStats = apps.get_model('tasks', 'TaskStats')
+    aggregates = {
+        'total': Count('id'),
+        'completed': Count('id', filter=Q(is_completed=True)),
+        **{f'status_{status}': Count('id', filter=Q(status=status)) for status in STATUSES},
+        **{f'priority_{priority}': Count('id', filter=Q(priority=priority)) for priority in PRIORITIES},
+    }
+
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        counted = {
+            row.pop('user_id'): row
+            for row in Task.objects.filter(user_id__in=batch).order_by()
+            .values('user_id').annotate(**aggregates)
+        }
+        TaskStats.objects.bulk_create(
+            [TaskStats(user_id=user_id, **counted.get(user_id, {})) for user_id in batch]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tasks', '0004_task_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('status_todo', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_completed', models.IntegerField(default=0)),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'task stats',
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,253 @@
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Lower, Trim
+
+FTS_TABLE = 'tasks_task_fts'
+INDEX_NAME = 'tasks_task_search_idx'
+BATCH_SIZE = 1000
+
+PRIORITIES = {'low': 1, 'medium': 2, 'high': 3}
+STATUSES = {'todo': 1, 'to do': 1, 'in_progress': 2, 'in progress': 2, 'completed': 3}
+
+# The search objects from 0004 cover the old category column and, on SQLite,
+# would not survive the table rebuild; drop them and recreate them at the end.
+# The SQLite FTS table now stores its own copy of the category name, and
+# Postgres/MySQL index title and description only (category names are
+# matched through the categories table, see tasks.search).
+DROP_SEARCH = {
+    'sqlite': [
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_category_au',
+        f'DROP TABLE IF EXISTS {FTS_TABLE}',
+    ],
+    'postgresql': [f'DROP INDEX IF EXISTS {INDEX_NAME}'],
+    'mysql': [f'ALTER TABLE tasks_task DROP INDEX {INDEX_NAME}'],
+}
+
+CATEGORY_NAME = "COALESCE((SELECT name FROM tasks_category WHERE id = new.category_id), '')"
+
+CREATE_SEARCH = {
+    'sqlite': [
+        f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            title, description, category,
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON tasks_task BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description, category)
+            VALUES (new.id, new.title, new.description, {CATEGORY_NAME});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON tasks_task BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, description, category_id ON tasks_task BEGIN
+            UPDATE {FTS_TABLE}
+            SET title = new.title, description = new.description, category = {CATEGORY_NAME}
+            WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_category_au AFTER UPDATE OF name ON tasks_category BEGIN
+            UPDATE {FTS_TABLE} SET category = new.name
+            WHERE rowid IN (SELECT id FROM tasks_task WHERE category_id = new.id);
+        END
+        """,
+        f"""
+        INSERT INTO {FTS_TABLE}(rowid, title, description, category)
+        SELECT tasks_task.id, tasks_task.title, tasks_task.description, COALESCE(tasks_category.name, '')
+        FROM tasks_task LEFT JOIN tasks_category ON tasks_category.id = tasks_task.category_id
+        """,
+    ],
+    'postgresql': [
+        f"""
+        CREATE INDEX {INDEX_NAME} ON tasks_task USING GIN (
+            to_tsvector('english', title || ' ' || description)
+        )
+        """,
+    ],
+    'mysql': [f'ALTER TABLE tasks_task ADD FULLTEXT INDEX {INDEX_NAME} (title, description)'],
+}
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+def convert_tasks(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    Category = apps.get_model('tasks', 'Category')
+
+    # Priority and status in one pass; unknown values fall back to the defaults
+    Task.objects.update(
+        priority_new=Case(
+            *[When(priority__iexact=key, then=Value(value)) for key, value in PRIORITIES.items()],
+            default=Value(PRIORITIES['medium']),
+        ),
+        status_new=Case(
+            *[When(status__iexact=key, then=Value(value)) for key, value in STATUSES.items()],
+            When(is_completed=True, then=Value(STATUSES['completed'])),
+            default=Value(STATUSES['todo']),
+        ),
+    )
+
+    # One category per user and case-insensitive name, keeping one of the spellings
+    names = (
+        Task.objects.annotate(key=Lower(Trim('category')))
+        .exclude(key='')
+        .values('user_id', 'key')
+        .annotate(name=Min(Trim('category')))
+        .order_by()
+        .values_list('user_id', 'name')
+    )
+    batch = []
+    for user_id, name in names.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Category(user_id=user_id, name=name))
+        if len(batch) >= BATCH_SIZE:
+            Category.objects.bulk_create(batch)
+            batch = []
+    Category.objects.bulk_create(batch)
+
+    Task.objects.exclude(category='').update(category_new=Subquery(
+        Category.objects.annotate(key=Lower('name'))
+        .filter(user_id=OuterRef('user_id'), key=Lower(Trim(OuterRef('category'))))
+        .values('id')[:1]
+    ))
+
+
+def recount_stats(apps, schema_editor):
+    """
+    0005 counted the old strings by exact match, so mixed-case, aliased and
+    unknown values were left out; count the converted integers instead.
+    """
+    User = apps.get_model('auth', 'User')
+    Task = apps.get_model('tasks', 'Task')
+    TaskStats = apps.get_model('tasks', 'TaskStats')
+    aggregates = {
+        'total': Count('id'),
+        'completed': Count('id', filter=Q(is_completed=True)),
+        'status_todo': Count('id', filter=Q(status=STATUSES['todo'])),
+        'status_in_progress': Count('id', filter=Q(status=STATUSES['in_progress'])),
+        'status_completed': Count('id', filter=Q(status=STATUSES['completed'])),
+        **{f'priority_{key}': Count('id', filter=Q(priority=value)) for key, value in PRIORITIES.items()},
+    }
+    empty = dict.fromkeys(aggregates, 0)
+
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        counted = {
+            row.pop('user_id'): row
+            for row in Task.objects.filter(user_id__in=batch).order_by()
+            .values('user_id').annotate(**aggregates)
+        }
+        TaskStats.objects.bulk_update(
+            [TaskStats(user_id=user_id, **counted.get(user_id, empty)) for user_id in batch],
+            list(aggregates),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0005_taskstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(DROP_SEARCH), migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_categories', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'constraints': [models.UniqueConstraint(models.F('user'), django.db.models.functions.text.Lower('name'), name='category_user_name_uniq')],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_user_status_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='priority_new',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='status_new',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='category_new',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tasks.category'),
+        ),
+        # Lossy (category spellings are merged), so not reversible
+        migrations.RunPython(convert_tasks),
+        migrations.RemoveField(
+            model_name='task',
+            name='priority',
+        ),
+        migrations.RemoveField(
+            model_name='task',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='task',
+            name='category',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='priority_new',
+            new_name='priority',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='status_new',
+            new_name='status',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='category_new',
+            new_name='category',
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'To Do'), (2, 'In Progress'), (3, 'Completed')], default=1),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tasks', to='tasks.category'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status'], name='task_user_status_idx'),
+        ),
+        migrations.RunPython(recount_stats, migrations.RunPython.noop),
+        migrations.RunPython(run(CREATE_SEARCH), migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_choices_and_categories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskstats',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,20 +1,274 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import DEFERRED, Q
+from django.db.models.functions import Lower
+
+# Task fields that feed the TaskStats counters
+COUNTER_FIELDS = ('user_id', 'is_completed', 'status', 'priority')
+
+
+class KeyedChoices(models.IntegerChoices):
+    """Integer choices that are also addressable by a lowercase key ('in_progress')."""
+
+    @property
+    def key(self):
+        return self.name.lower()
+
+    @classmethod
+    def from_key(cls, key):
+        """The member for ``key``; raises ValueError for unknown keys."""
+        try:
+            return cls[str(key).upper()]
+        except KeyError:
+            raise ValueError(f'Unknown {cls.__name__.lower()} {key!r}')
+
+
+class Category(models.Model):
+    """A user's task category; names are unique per user regardless of case."""
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='task_categories')
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name_plural = 'categories'
+        constraints = [
+            models.UniqueConstraint('user', Lower('name'), name='category_user_name_uniq'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize(name):
+        """``name`` with surrounding and repeated whitespace removed."""
+        return ' '.join((name or '').split())
+
+    @classmethod
+    def for_name(cls, user, name):
+        """``user``'s category called ``name`` in any case, created on first use; None if blank."""
+        name = cls.normalize(name)
+        if not name:
+            return None
+        category = cls.objects.filter(user=user, name__iexact=name).first()
+        if category is None:
+            try:
+                with transaction.atomic():
+                    category = cls.objects.create(user=user, name=name)
+            except IntegrityError:
+                # Created concurrently
+                category = cls.objects.get(user=user, name__iexact=name)
+        return category
+
+    @classmethod
+    def for_names(cls, user, names):
+        """
+        Map the lowercased form of each non-blank name in ``names`` to
+        ``user``'s category, creating the missing ones with one insert.
+        """
+        wanted = {}
+        for name in map(cls.normalize, names):
+            if name:
+                # The first spelling of a new name wins
+                wanted.setdefault(name.lower(), name)
+        categories = {category.name.lower(): category for category in cls.objects.filter(user=user)}
+        missing = [cls(user=user, name=name) for key, name in wanted.items() if key not in categories]
+        if missing:
+            # Not every backend returns the new ids; read them back
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            categories = {category.name.lower(): category for category in cls.objects.filter(user=user)}
+        return {key: categories[key] for key in wanted if key in categories}
+
+
+class TaskQuerySet(models.QuerySet):
+
+    def delete(self):
+        # No post_delete receiver on Task: it would make every delete that
+        # reaches tasks, deleting their owner included, load and signal them
+        # one by one. Deleting the owner needs no counters, as the TaskStats
+        # row goes with it. Imported here since tasks.signals imports this module
+        from .signals import tasks_deleting
+        with transaction.atomic(savepoint=False):
+            tasks_deleting(self)
+            return super().delete()
+
 
 # Create your models here.
 class Task(models.Model):
+    class Priority(KeyedChoices):
+        LOW = 1, 'Low'
+        MEDIUM = 2, 'Medium'
+        HIGH = 3, 'High'
+
+    class Status(KeyedChoices):
+        TODO = 1, 'To Do'
+        IN_PROGRESS = 2, 'In Progress'
+        COMPLETED = 3, 'Completed'
+
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField()
-    priority = models.CharField(max_length=50)
+    priority = models.PositiveSmallIntegerField(choices=Priority, default=Priority.MEDIUM)
     due_date = models.DateField()
-    status = models.CharField(max_length=50)
-    category = models.CharField(max_length=100)
+    status = models.PositiveSmallIntegerField(choices=Status, default=Status.TODO)
+    category = models.ForeignKey(
+        Category, null=True, blank=True, on_delete=models.SET_NULL, related_name='tasks',
+    )
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Per-user task lists and their (created_at, id) keyset pagination
+            models.Index(fields=['user', '-created_at', '-id'], name='task_user_created_idx'),
+            # Calendar month ranges and upcoming tasks
+            models.Index(fields=['user', 'due_date'], name='task_user_due_idx'),
+            # Status counters
+            models.Index(fields=['user', 'status'], name='task_user_status_idx'),
+            # Open tasks by due date (overdue/upcoming). Partial where the
+            # backend supports it (Postgres, SQLite); skipped on MySQL.
+            models.Index(
+                fields=['user', 'due_date'],
+                name='task_user_open_due_idx',
+                condition=Q(is_completed=False),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored due date so moving a task to another month
+        # invalidates both cached calendar months (see tasks.signals)
+        instance._loaded_due_date = instance.__dict__.get('due_date')
+        # DEFERRED where not loaded. save() re-reads them under a row lock;
+        # bulk writes use these after loading with select_for_update()
+        instance._loaded_counters = tuple(instance.__dict__.get(name, DEFERRED) for name in COUNTER_FIELDS)
+        return instance
+
+    def counter_state(self):
+        """The values TaskStats counts this task by."""
+        return tuple(getattr(self, name) for name in COUNTER_FIELDS)
+
+    @property
+    def priority_key(self):
+        return self.Priority(self.priority).key
 
+    @property
+    def status_key(self):
+        return self.Status(self.status).key
+
+    def save(self, *args, **kwargs):
+        # pre_save locks the row and post_save updates the owner's TaskStats;
+        # keep both in the same transaction. Nothing is rolled back to here,
+        # so inside a caller's transaction skip the savepoint
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # In place of a post_delete receiver; see TaskQuerySet.delete()
+        from .signals import task_deleting
+        with transaction.atomic(savepoint=False):
+            task_deleting(self)
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.title
-    
\ No newline at end of file
+
+
+class TaskStats(models.Model):
+    """
+    Per-user task counters, adjusted with F() expressions in the same
+    transaction as every task write (see tasks.signals and tasks.stats).
+    ``manage.py rebuild_task_stats`` recomputes them if they drift.
+    """
+    user = models.OneToOneField(
+        'auth.User', on_delete=models.CASCADE, primary_key=True, related_name='task_stats',
+    )
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    status_todo = models.IntegerField(default=0)
+    status_in_progress = models.IntegerField(default=0)
+    status_completed = models.IntegerField(default=0)
+    priority_low = models.IntegerField(default=0)
+    priority_medium = models.IntegerField(default=0)
+    priority_high = models.IntegerField(default=0)
+    # Bumped by every task write; part of the users' page ETags (tasks.http)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTERS = (
+        'total', 'completed',
+        *(f'status_{status.key}' for status in Task.Status),
+        *(f'priority_{priority.key}' for priority in Task.Priority),
+    )
+
+    class Meta:
+        verbose_name_plural = 'task stats'
+
+    def __str__(self):
+        return f'Task stats for user {self.user_id}'
+
+
+class Recurrence(models.Model):
+    """
+    A repeating task, stored once: the fields its occurrences share and the
+    rule that dates them. Occurrences are expanded for the dates a page shows
+    (tasks.recurrence); a row is only written when one is completed, edited
+    or skipped (see Occurrence).
+    """
+    class Frequency(KeyedChoices):
+        DAILY = 1, 'Daily'
+        WEEKLY = 2, 'Weekly'
+        MONTHLY = 3, 'Monthly'
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='task_recurrences')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    priority = models.PositiveSmallIntegerField(choices=Task.Priority, default=Task.Priority.MEDIUM)
+    category = models.ForeignKey(
+        Category, null=True, blank=True, on_delete=models.SET_NULL, related_name='recurrences',
+    )
+    frequency = models.PositiveSmallIntegerField(choices=Frequency)
+    # Every `interval` days, weeks or months
+    interval = models.PositiveSmallIntegerField(default=1)
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=Q(interval__gte=1), name='recurrence_interval_positive'),
+        ]
+
+    def __str__(self):
+        return f'{self.title} ({self.describe()})'
+
+    def describe(self):
+        """The rule in words, e.g. 'Every 2 weeks until Jun 30, 2026'."""
+        unit = {self.Frequency.DAILY: 'day', self.Frequency.WEEKLY: 'week', self.Frequency.MONTHLY: 'month'}[self.frequency]
+        text = f'Every {unit}' if self.interval == 1 else f'Every {self.interval} {unit}s'
+        if self.ends_on:
+            text += f" until {self.ends_on.strftime('%b %d, %Y')}"
+        return text
+
+
+class Occurrence(models.Model):
+    """
+    A date of a Recurrence that no longer follows the rule: completed or
+    edited (``task`` is the Task written for it) or skipped (``task`` is
+    null, also after that Task is deleted).
+    """
+    recurrence = models.ForeignKey(Recurrence, on_delete=models.CASCADE, related_name='occurrences')
+    date = models.DateField()
+    task = models.OneToOneField(
+        Task, null=True, blank=True, on_delete=models.SET_NULL, related_name='occurrence',
+    )
+
+    class Meta:
+        constraints = [
+            # Also the index expansion reads a window of dates from
+            models.UniqueConstraint(fields=['recurrence', 'date'], name='occurrence_recurrence_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.recurrence.title} on {self.date}'
@@ -0,0 +1,158 @@
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _json_default(value):
+    # Full-precision ISO format; DjangoJSONEncoder would truncate microseconds
+    # and break equality on the keyset columns.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the list of keyset values in ``cursor`` or None if it is invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class CursorPage:
+    """One page of a keyset-paginated queryset."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row of the previous page
+    instead of using OFFSET, so every page costs the same index range scan
+    no matter how deep it is. ``ordering`` defaults to the queryset's own
+    ordering and must end with a unique field.
+    """
+
+    def __init__(self, queryset, ordering=None, per_page=20):
+        self.queryset = queryset
+        self.ordering = tuple(ordering or queryset.query.order_by or ('-created_at', '-id'))
+        self.per_page = per_page
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def _seek(self, values, backwards):
+        """Q matching rows strictly after (or before) the row holding ``values``."""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != backwards
+            lookup = f"{self.fields[i]}__{'lt' if descending else 'gt'}"
+            term = Q(**{lookup: values[i]})
+            for name, value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{name: value})
+            condition |= term
+        return condition
+
+    def _field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        return annotation.output_field if annotation is not None else self.queryset.model._meta.get_field(name)
+
+    def _values(self, cursor):
+        """The keyset values in ``cursor`` as Python values, or None if they don't fit the ordering."""
+        values = decode_cursor(cursor)
+        if values is None or len(values) != len(self.fields):
+            return None
+        try:
+            values = [self._field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        return None if None in values else values
+
+    def _cursor(self, item):
+        if isinstance(item, dict):
+            return encode_cursor(item[name] for name in self.fields)
+        return encode_cursor(getattr(item, name) for name in self.fields)
+
+    def _query(self, after, before):
+        """The queryset for one page and whether it is walked backwards."""
+        after = self._values(after)
+        before = self._values(before)
+
+        if before is not None and after is None:
+            reverse_ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering
+            ]
+            queryset = (
+                self.queryset.filter(self._seek(before, backwards=True))
+                .order_by(*reverse_ordering)
+            )
+            return queryset[:self.per_page + 1], True, False
+
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(self._seek(after, backwards=False))
+        return queryset.order_by(*self.ordering)[:self.per_page + 1], False, after is not None
+
+    def _page(self, rows, backwards, from_cursor):
+        more = len(rows) > self.per_page
+        if backwards:
+            items = rows[:self.per_page][::-1]
+            has_previous, has_next = more, True
+        else:
+            items = rows[:self.per_page]
+            has_previous, has_next = from_cursor, more
+
+        if not items:
+            return CursorPage(items)
+        return CursorPage(
+            items,
+            next_cursor=self._cursor(items[-1]) if has_next else None,
+            previous_cursor=self._cursor(items[0]) if has_previous else None,
+        )
+
+    def page(self, after=None, before=None):
+        queryset, backwards, from_cursor = self._query(after, before)
+        return self._page(list(queryset), backwards, from_cursor)
+
+    async def apage(self, after=None, before=None):
+        queryset, backwards, from_cursor = self._query(after, before)
+        return self._page([row async for row in queryset], backwards, from_cursor)
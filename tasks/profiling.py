@@ -0,0 +1,274 @@
+"""
+On-demand request profiling.
+
+With PROFILING on, a request carrying a valid profile token (the ``_profile``
+query parameter or an ``X-Profile-Token`` header) is sampled: a background
+thread records the request thread's Python stack every PROFILE_INTERVAL
+seconds. The samples are written to PROFILE_DIR in the collapsed-stack
+format flamegraph.pl and speedscope read, next to a small JSON summary.
+Staff create tokens and download profiles at /profiles/. With PROFILING off
+the middleware removes itself from the stack.
+
+Tokens are signed and expire after PROFILE_TOKEN_MAX_AGE seconds; a staff
+member can hand one to a user to profile that user's slow page. Profiles
+cover the view and middleware up to the response object; the body of a
+streaming response is produced later and not sampled.
+
+Under ASGI the event loop's thread runs every request's coroutines, so it
+is not sampled. Django gives each request one thread for its
+thread-sensitive sync_to_async calls, where the async views' ORM and
+template work runs. With a sync-only middleware below this one
+(whitenoise), the middleware itself runs in that thread and samples it
+like under WSGI; time the view spends awaiting shows up as the thread
+waiting in AsyncToSync. Otherwise it runs on the loop and samples the
+request task's chain of awaiting coroutines, followed by the sync thread's
+stack while that thread works for it.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from inspect import iscoroutinefunction
+from pathlib import Path
+
+from asgiref.sync import SyncToAsync, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PARAM = '_profile'
+TOKEN_HEADER = 'X-Profile-Token'
+TOKEN_SALT = 'tasks.profiling'
+PROFILE_NAME_RE = re.compile(r'^[\w-]+$')
+
+_sequence = itertools.count()
+_frame_labels = {}
+# Where sync_to_async starts running the sync function in its thread
+_THREAD_HANDLER = SyncToAsync.thread_handler.__code__
+
+
+def make_token(user):
+    """A profile token issued by ``user``."""
+    return signing.dumps(user.pk, salt=TOKEN_SALT, compress=True)
+
+
+def token_issuer(request):
+    """Id of the staff user who issued the request's profile token, or None."""
+    token = request.GET.get(TOKEN_PARAM) or request.headers.get(TOKEN_HEADER)
+    if not token:
+        return None
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        logger.info("Ignoring an invalid or expired profile token on %s", request.path)
+        return None
+
+
+def _frame_label(code):
+    label = _frame_labels.get(code)
+    if label is None:
+        path = code.co_filename
+        base = str(settings.BASE_DIR) + os.sep
+        if path.startswith(base):
+            path = path[len(base):]
+        elif 'site-packages' + os.sep in path:
+            path = path.split('site-packages' + os.sep, 1)[1]
+        label = _frame_labels[code] = f'{code.co_qualname} ({path}:{code.co_firstlineno})'
+    return label
+
+
+def _collapse(frame):
+    """``frame``'s stack, outermost call first, joined with semicolons."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _await_chain(task):
+    """Labels of the coroutines ``task`` is running or awaiting, outermost first."""
+    labels = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'ag_frame', None)
+        if frame is None:
+            # A Future, e.g. the result of a sync_to_async call
+            break
+        labels.append(_frame_label(frame.f_code))
+        awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'ag_await', None)
+    return labels
+
+
+def _sync_work(frame):
+    """Labels of ``frame``'s stack below asgiref's sync_to_async entry point, or None if idle."""
+    labels = []
+    while frame is not None:
+        if frame.f_code is _THREAD_HANDLER:
+            return labels[::-1]
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return None
+
+
+class StackSampler:
+    """Counts one thread's stacks, sampled from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def sample(self):
+        """The collapsed stack to count now, or None."""
+        frame = sys._current_frames().get(self.thread_id)
+        return _collapse(frame) if frame is not None else None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            stack = self.sample()
+            if stack:
+                self.stacks[stack] += 1
+
+
+class TaskSampler(StackSampler):
+    """
+    Counts an asyncio task's await chain, extended with the stack of
+    ``thread_id`` (its sync_to_async thread) while that thread is busy.
+    """
+
+    def __init__(self, task, thread_id, interval):
+        super().__init__(thread_id, interval)
+        self.task = task
+
+    def sample(self):
+        labels = _await_chain(self.task)
+        frame = sys._current_frames().get(self.thread_id)
+        sync = _sync_work(frame) if frame is not None else None
+        return ';'.join(labels + (sync or [])) or None
+
+
+def save_profile(request, response, sampler, elapsed, issuer):
+    """Write the samples and their summary to PROFILE_DIR; returns the profile's name."""
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}"
+    match = request.resolver_match
+    user = getattr(request, 'user', None)
+    summary = {
+        'name': name,
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'duration_ms': round(elapsed * 1000, 1),
+        'samples': sum(sampler.stacks.values()),
+        'interval_ms': sampler.interval * 1000,
+        'user': user.get_username() if user is not None and user.is_authenticated else None,
+        'issued_by': issuer,
+        'created': time.time(),
+    }
+    with open(directory / f'{name}.folded', 'w', encoding='utf-8') as file:
+        for stack, count in sampler.stacks.most_common():
+            file.write(f'{stack} {count}\n')
+    with open(directory / f'{name}.json', 'w', encoding='utf-8') as file:
+        json.dump(summary, file)
+    _prune(directory)
+    return name
+
+
+def _prune(directory):
+    summaries = sorted(directory.glob('*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in summaries[settings.PROFILE_KEEP:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.folded').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first."""
+    directory = Path(settings.PROFILE_DIR)
+    profiles = []
+    for path in directory.glob('*.json'):
+        try:
+            with open(path, encoding='utf-8') as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            # Pruned or half-written by another worker
+            continue
+    return sorted(profiles, key=lambda profile: profile['created'], reverse=True)
+
+
+def profile_path(name):
+    """Path of the collapsed stacks of profile ``name``, or None if there is none."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = Path(settings.PROFILE_DIR) / f'{name}.folded'
+    return path if path.is_file() else None
+
+
+class RequestProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        issuer = token_issuer(request)
+        if issuer is None:
+            return self.get_response(request)
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        return self.finish(request, response, sampler, time.perf_counter() - started, issuer)
+
+    async def __acall__(self, request):
+        issuer = token_issuer(request)
+        if issuer is None:
+            return await self.get_response(request)
+        # The event loop's thread also runs other requests; follow this
+        # request's task and the thread its sync_to_async calls run in
+        sync_thread = await sync_to_async(threading.get_ident)()
+        sampler = TaskSampler(asyncio.current_task(), sync_thread, settings.PROFILE_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler.stop()
+        return self.finish(request, response, sampler, time.perf_counter() - started, issuer)
+
+    def finish(self, request, response, sampler, elapsed, issuer):
+        try:
+            response.headers['X-Profile'] = save_profile(request, response, sampler, elapsed, issuer)
+        except OSError:
+            logger.exception("Could not save the profile of %s", request.path)
+        return response
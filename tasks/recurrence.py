@@ -0,0 +1,186 @@
+"""
+Recurring tasks: expanding the rules and writing single occurrences.
+
+A Recurrence is stored once and its dates are computed for the window a
+page shows. occurrence_dates() jumps straight to the first date in the
+window, so expanding costs the same for a series started last week or ten
+years ago. Dates with an Occurrence row are left out of the expansion:
+completed and edited ones are ordinary Task rows by then (and show up as
+tasks everywhere), skipped ones are gone.
+
+A user's rules are cached until one changes (tasks.signals); the
+Occurrence rows of a window are read with one query on their unique
+(recurrence, date) index, and only when a rule is active in the window.
+"""
+import calendar
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Occurrence, Recurrence, Task
+from .stats import apply_counter_changes
+
+# The task list shows occurrences this many days either side of today
+UPCOMING_DAYS = 7
+
+
+def recurrences_cache_key(user_id):
+    return f'tasks:recurrences:{user_id}'
+
+
+def _add_months(first, months):
+    # Day 31 falls back to the end of shorter months, every month anew
+    year, month = divmod(first.month - 1 + months, 12)
+    year += first.year
+    return first.replace(year=year, month=month + 1, day=min(first.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrence_dates(recurrence, start, end):
+    """Yield ``recurrence``'s dates from ``start`` to ``end``, inclusive."""
+    first, interval = recurrence.starts_on, recurrence.interval
+    last = min(end, recurrence.ends_on) if recurrence.ends_on else end
+    start = max(start, first)
+    if start > last:
+        return
+
+    if recurrence.frequency == Recurrence.Frequency.MONTHLY:
+        # First step whose month is not before start's, then at most one more
+        step = -(-((start.year - first.year) * 12 + start.month - first.month) // interval)
+        day = _add_months(first, step * interval)
+        while day <= last:
+            if day >= start:
+                yield day
+            step += 1
+            day = _add_months(first, step * interval)
+    else:
+        days = interval * (7 if recurrence.frequency == Recurrence.Frequency.WEEKLY else 1)
+        day = first + timedelta(days=-(-(start - first).days // days) * days)
+        while day <= last:
+            yield day
+            day += timedelta(days=days)
+
+
+def occurs_on(recurrence, day):
+    return next(occurrence_dates(recurrence, day, day), None) == day
+
+
+def _rules():
+    return Recurrence.objects.select_related('category').order_by('starts_on', 'id')
+
+
+def user_recurrences(user_id):
+    """All of ``user_id``'s recurrences, cached until one changes."""
+    key = recurrences_cache_key(user_id)
+    recurrences = cache.get(key)
+    if recurrences is None:
+        recurrences = list(_rules().filter(user_id=user_id))
+        cache.set(key, recurrences, settings.TASK_CALENDAR_CACHE_TIMEOUT)
+    return recurrences
+
+
+async def auser_recurrences(user_id):
+    key = recurrences_cache_key(user_id)
+    recurrences = await cache.aget(key)
+    if recurrences is None:
+        recurrences = [recurrence async for recurrence in _rules().filter(user_id=user_id)]
+        await cache.aset(key, recurrences, settings.TASK_CALENDAR_CACHE_TIMEOUT)
+    return recurrences
+
+
+def _active(recurrences, start, end):
+    return [
+        recurrence for recurrence in recurrences
+        if recurrence.starts_on <= end and (recurrence.ends_on is None or recurrence.ends_on >= start)
+    ]
+
+
+def _written(recurrences, start, end):
+    return (
+        Occurrence.objects
+        .filter(recurrence__in=[recurrence.pk for recurrence in recurrences], date__range=(start, end))
+        .values_list('recurrence_id', 'date')
+    )
+
+
+def _expand(recurrences, written, start, end):
+    written = set(written)
+    occurrences = []
+    for recurrence in recurrences:
+        for day in occurrence_dates(recurrence, start, end):
+            if (recurrence.pk, day) not in written:
+                occurrences.append({
+                    'recurrence': recurrence.pk,
+                    'date': day,
+                    'title': recurrence.title,
+                    'priority': Task.Priority(recurrence.priority).key,
+                    'category': recurrence.category.name if recurrence.category else '',
+                    'rule': recurrence.describe(),
+                    'is_completed': False,
+                })
+    occurrences.sort(key=lambda occurrence: (occurrence['date'], occurrence['recurrence']))
+    return occurrences
+
+
+def expand(user_id, start, end):
+    """
+    The open occurrences of ``user_id``'s recurrences from ``start`` to
+    ``end``, by date, as dicts with the recurrence's id and the date.
+    """
+    recurrences = _active(user_recurrences(user_id), start, end)
+    if not recurrences:
+        return []
+    return _expand(recurrences, _written(recurrences, start, end), start, end)
+
+
+async def aexpand(user_id, start, end):
+    recurrences = _active(await auser_recurrences(user_id), start, end)
+    if not recurrences:
+        return []
+    return _expand(recurrences, [row async for row in _written(recurrences, start, end)], start, end)
+
+
+def materialize(recurrence, day, **fields):
+    """
+    The Task for ``recurrence``'s occurrence on ``day``, written on first use
+    with ``fields`` set on it; None if the occurrence was skipped. Raises
+    ValueError if the rule has no occurrence on ``day``.
+    """
+    if not occurs_on(recurrence, day):
+        raise ValueError(f'{recurrence} has no occurrence on {day}')
+    written = Occurrence.objects.select_related('task').filter(recurrence=recurrence, date=day).first()
+    if written is not None:
+        return written.task
+    try:
+        with transaction.atomic():
+            task = Task.objects.create(
+                user_id=recurrence.user_id,
+                title=recurrence.title,
+                description=recurrence.description,
+                priority=recurrence.priority,
+                category_id=recurrence.category_id,
+                due_date=day,
+                **fields,
+            )
+            # The unique (recurrence, date) index rolls the task back if
+            # the date was written concurrently
+            Occurrence.objects.create(recurrence=recurrence, date=day, task=task)
+    except IntegrityError:
+        return Occurrence.objects.select_related('task').get(recurrence=recurrence, date=day).task
+    return task
+
+
+def skip(recurrence, day):
+    """Drop ``recurrence``'s occurrence on ``day``; False if it was already written."""
+    if not occurs_on(recurrence, day):
+        raise ValueError(f'{recurrence} has no occurrence on {day}')
+    try:
+        with transaction.atomic():
+            Occurrence.objects.create(recurrence=recurrence, date=day)
+    except IntegrityError:
+        # Completed, edited or skipped before
+        return False
+    # The pages showing it must not answer 304
+    apply_counter_changes({recurrence.user_id: {'version': 1}})
+    return True
@@ -0,0 +1,143 @@
+"""
+Full-text task search on the database's native engine.
+
+SQLite uses an FTS5 table kept in sync by triggers, Postgres a GIN index on
+a tsvector expression and MySQL a FULLTEXT index; see migration 0006. On
+every backend each search term must start a word of the title, the
+description or the category name, and different terms may match different
+fields. The FTS5 table carries each task's category name. On Postgres and
+MySQL the index covers title and description, and each term's matching
+categories are looked up in the owner's (small) categories table as a
+separate predicate, so an OR of the two still leaves the full-text index
+usable (see _term_filter). Other backends match the words with a regex.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Category
+
+FTS_TABLE = 'tasks_task_fts'
+INDEX_NAME = 'tasks_task_search_idx'
+
+# Must match the indexed expression exactly for Postgres to use the index
+PG_VECTOR = "to_tsvector('english', {table}.title || ' ' || {table}.description)"
+MYSQL_MATCH = 'MATCH ({table}.title, {table}.description) AGAINST (%s IN BOOLEAN MODE)'
+
+MAX_TERMS = 8
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def search_terms(query):
+    return WORD_RE.findall(query)[:MAX_TERMS]
+
+
+def _table():
+    return connection.ops.quote_name('tasks_task')
+
+
+def _sqlite_match(terms):
+    # Every term must match, each as a prefix: "foo"* "bar"*
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _pg_tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _mysql_boolean(terms):
+    return ' '.join(f'+{term}*' for term in terms)
+
+
+def _word_start(term):
+    # Terms are letters and digits only, so safe in a pattern
+    return rf'(^|\W){term}'
+
+
+def _starts_word(field, term):
+    return Q(**{f'{field}__iregex': _word_start(term)})
+
+
+def _term_filter(term, vendor, user_id):
+    """
+    Tasks matching one search term on Postgres, MySQL or the regex fallback.
+
+    The text and category tests are both predicates on tasks_task that an
+    index can answer, never an OR across a join. On Postgres the plan is a
+    BitmapOr of the GIN expression index and the category_id index: the
+    ARRAY() of category ids is an InitPlan run once, and "= ANY" on it is
+    indexable. MySQL cannot combine MATCH with OR, so the FULLTEXT lookup
+    runs in a subquery that is materialised once and probed by id.
+    """
+    categories = Category.objects.filter(user_id=user_id, name__iregex=_word_start(term)).values('id')
+    if vendor == 'postgresql':
+        table = _table()
+        category_sql, category_params = categories.query.sql_with_params()
+        return Q(RawSQL(
+            f"({PG_VECTOR.format(table=table)} @@ to_tsquery('english', %s)"
+            f' OR {table}.category_id = ANY(ARRAY({category_sql})))',
+            (_pg_tsquery([term]), *category_params),
+            output_field=BooleanField(),
+        ))
+    if vendor == 'mysql':
+        text = Q(id__in=RawSQL(
+            f'SELECT t.id FROM tasks_task t WHERE t.user_id = %s AND {MYSQL_MATCH.format(table="t")}',
+            (user_id, _mysql_boolean([term])),
+        ))
+    else:
+        text = _starts_word('title', term) | _starts_word('description', term)
+    return text | Q(category_id__in=categories)
+
+
+def search_tasks(queryset, query, user_id):
+    """Filter ``queryset``, tasks of ``user_id``, to those matching every term of ``query``."""
+    terms = search_terms(query)
+    vendor = connection.vendor
+
+    if not terms:
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        )
+    if vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (_sqlite_match(terms),),
+        ))
+    return queryset.filter(*(_term_filter(term, vendor, user_id) for term in terms))
+
+
+def rank_tasks(queryset, query):
+    """
+    Annotate ``search_rank`` on tasks already filtered by ``search_tasks`` and
+    order them best match first, with ``id`` as the unique tie-breaker.
+    """
+    terms = search_terms(query)
+    vendor = connection.vendor
+    table = _table()
+
+    if not terms or vendor not in ('sqlite', 'postgresql', 'mysql'):
+        return queryset.order_by('-created_at', '-id')
+
+    if vendor == 'sqlite':
+        # bm25() is lower-is-better; weight title over category over description
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}, 10.0, 1.0, 5.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+            (_sqlite_match(terms),),
+            output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank).order_by('search_rank', '-id')
+    if vendor == 'postgresql':
+        rank = RawSQL(
+            f"ts_rank({PG_VECTOR.format(table=table)}, to_tsquery('english', %s))",
+            (_pg_tsquery(terms),),
+            output_field=FloatField(),
+        )
+    else:
+        rank = RawSQL(MYSQL_MATCH.format(table=table), (_mysql_boolean(terms),), output_field=FloatField())
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', '-id')
+
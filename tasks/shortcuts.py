@@ -0,0 +1,19 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
+async def arender(request, template_name, context=None):
+    """
+    render() for async views. Templates read the session (messages) and the
+    lazy request.user synchronously, so rendering runs in the sync thread.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def aresolve_user(request):
+    """
+    Resolve the user via the async ORM and store it on ``request.user`` so
+    the template context does not look it up again in the sync thread.
+    """
+    request.user = await request.auser()
+    return request.user
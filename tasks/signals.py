@@ -0,0 +1,93 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .calendar_grid import invalidate_month_grids
+from .models import Category, Recurrence, Task, TaskStats
+from .recurrence import recurrences_cache_key
+from .stats import (
+    apply_counter_changes, invalidate_user_task_stats, load_counter_state, task_deleted, task_saved, tasks_deleted,
+)
+
+
+def invalidate_task_caches(user_id, *due_dates):
+    """
+    Drop ``user_id``'s cached statistics and the calendar months of
+    ``due_dates`` once the current transaction commits, so a concurrent
+    reader cannot cache the old values again in between. Bulk writes skip
+    model signals and call this themselves.
+    """
+    def invalidate():
+        invalidate_user_task_stats(user_id)
+        invalidate_month_grids(user_id, *due_dates)
+    transaction.on_commit(invalidate)
+
+
+@receiver(pre_save, sender=Task)
+def task_saving(sender, instance, **kwargs):
+    """Lock the stored row and read what the counters saw before an update."""
+    # An unsaved instance given an existing pk updates that row too
+    if not instance._state.adding or instance.pk is not None:
+        load_counter_state(instance)
+
+
+def _due_date(task):
+    # Views assign the raw form value, so normalise it before reading .month
+    return Task._meta.get_field('due_date').to_python(task.due_date)
+
+
+@receiver(post_save, sender=Task)
+def task_changed(sender, instance, created, **kwargs):
+    """Adjust the owner's TaskStats and drop their caches for the old and new months."""
+    task_saved(instance, created)
+    due_date = _due_date(instance)
+    invalidate_task_caches(instance.user_id, due_date, getattr(instance, '_loaded_due_date', None))
+    instance._loaded_due_date = due_date
+
+
+def task_deleting(task):
+    """Task.delete(): take the task out of its owner's TaskStats and caches."""
+    task_deleted(task)
+    invalidate_task_caches(task.user_id, _due_date(task), getattr(task, '_loaded_due_date', None))
+
+
+def tasks_deleting(queryset):
+    """The same for a queryset delete(), with one TaskStats update per owner."""
+    for user_id, due_dates in tasks_deleted(queryset).items():
+        invalidate_task_caches(user_id, *due_dates)
+
+
+@receiver(post_save, sender=Recurrence)
+@receiver(post_delete, sender=Recurrence)
+def recurrence_changed(sender, instance, **kwargs):
+    """Drop the owner's cached rules and change their pages' ETags."""
+    transaction.on_commit(partial(cache.delete, recurrences_cache_key(instance.user_id)))
+    origin = kwargs.get('origin')
+    if not (isinstance(origin, User) and origin.pk == instance.user_id):
+        apply_counter_changes({instance.user_id: {'version': 1}})
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, created=False, **kwargs):
+    """
+    Renaming or deleting a category changes the pages showing its name:
+    change their ETags and drop the owner's cached rules. A new category is
+    not shown until a task using it is saved.
+    """
+    if created:
+        return
+    transaction.on_commit(partial(cache.delete, recurrences_cache_key(instance.user_id)))
+    origin = kwargs.get('origin')
+    if not (isinstance(origin, User) and origin.pk == instance.user_id):
+        apply_counter_changes({instance.user_id: {'version': 1}})
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        TaskStats.objects.get_or_create(user=instance)
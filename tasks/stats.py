@@ -0,0 +1,249 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import COUNTER_FIELDS, Task, TaskStats
+
+
+def _stats_aggregates():
+    today = timezone.now().date()
+    open_tasks = Q(is_completed=False)
+    return {
+        'total': Count('id'),
+        'completed': Count('id', filter=Q(is_completed=True)),
+        'pending': Count('id', filter=open_tasks),
+        'overdue': Count('id', filter=open_tasks & Q(due_date__lt=today)),
+        'upcoming': Count('id', filter=open_tasks & Q(
+            due_date__gte=today,
+            due_date__lte=today + timedelta(days=7),
+        )),
+        'in_progress': Count('id', filter=Q(status=Task.Status.IN_PROGRESS)),
+        'todo': Count('id', filter=Q(status=Task.Status.TODO)),
+    }
+
+
+def task_stats(queryset):
+    """Compute every task counter for ``queryset`` in a single query."""
+    return queryset.order_by().aggregate(**_stats_aggregates())
+
+
+async def atask_stats(queryset):
+    return await queryset.order_by().aaggregate(**_stats_aggregates())
+
+
+# TaskStats counters
+
+def counter_changes(old=(), new=()):
+    """
+    Per-user counter deltas for tasks going from the ``old`` to the ``new``
+    counter states (see Task.counter_state); either side may be empty, or a
+    Counter of states. Every state also bumps the user's data version, even
+    when the counts net out.
+    """
+    changes = defaultdict(Counter)
+    for states, sign in ((old, -1), (new, 1)):
+        for (user_id, is_completed, status, priority), count in Counter(states).items():
+            counters = changes[user_id]
+            counters['version'] += count
+            counters['total'] += sign * count
+            if is_completed:
+                counters['completed'] += sign * count
+            if status in Task.Status:
+                counters[f'status_{Task.Status(status).key}'] += sign * count
+            if priority in Task.Priority:
+                counters[f'priority_{Task.Priority(priority).key}'] += sign * count
+    return changes
+
+
+def apply_counter_changes(changes):
+    """Add ``changes`` to the TaskStats rows with one UPDATE per affected user."""
+    now = timezone.now()
+    for user_id, counters in changes.items():
+        updates = {name: F(name) + value for name, value in counters.items() if value}
+        if updates:
+            TaskStats.objects.filter(user_id=user_id).update(updated_at=now, **updates)
+
+
+def task_saved(task, created):
+    # No stored state: the row was gone and save() inserted it again
+    loaded = getattr(task, '_loaded_counters', None)
+    old = () if created or loaded is None else [loaded]
+    apply_counter_changes(counter_changes(old, [task.counter_state()]))
+    task._loaded_counters = task.counter_state()
+
+
+def task_deleted(task):
+    state = getattr(task, '_loaded_counters', None) or task.counter_state()
+    apply_counter_changes(counter_changes(old=[state]))
+
+
+def tasks_deleted(queryset):
+    """
+    Subtract the tasks of ``queryset`` from their owners' counters, counted
+    with one aggregate query. Returns the due dates by user id.
+    """
+    states = Counter()
+    due_dates = defaultdict(set)
+    for *state, due_date, count in (
+        queryset.order_by().values_list(*COUNTER_FIELDS, 'due_date').annotate(count=Count('id'))
+    ):
+        states[tuple(state)] += count
+        due_dates[state[0]].add(due_date)
+    apply_counter_changes(counter_changes(old=states))
+    return due_dates
+
+
+def load_counter_state(task):
+    """
+    Set ``task._loaded_counters`` to the stored values before an update,
+    locking the row until the save commits. The values loaded with the task
+    may be stale: two requests toggling the same task would both apply the
+    same change to the counters.
+    """
+    stored = (
+        Task.objects.select_for_update().filter(pk=task.pk)
+        .values_list(*COUNTER_FIELDS, 'due_date').first()
+    )
+    task._loaded_counters = stored[:-1] if stored else None
+    if stored:
+        task._loaded_due_date = stored[-1]
+
+
+def _counter_aggregates():
+    return {
+        'total': Count('id'),
+        'completed': Count('id', filter=Q(is_completed=True)),
+        **{f'status_{status.key}': Count('id', filter=Q(status=status)) for status in Task.Status},
+        **{f'priority_{priority.key}': Count('id', filter=Q(priority=priority)) for priority in Task.Priority},
+    }
+
+
+def rebuild_task_stats(user_ids):
+    """
+    Recompute the TaskStats rows of ``user_ids`` from their tasks, creating
+    missing rows. Returns how many rows were missing or wrong.
+    """
+    with transaction.atomic():
+        # Lock the rows before counting: a task write committing in between
+        # would otherwise be in the count and then added to it again
+        stored = TaskStats.objects.select_for_update().in_bulk(user_ids)
+        counted = {
+            row.pop('user_id'): row
+            for row in Task.objects.filter(user_id__in=user_ids).order_by()
+            .values('user_id').annotate(**_counter_aggregates())
+        }
+        return _store_task_stats(user_ids, stored, counted)
+
+
+def _store_task_stats(user_ids, stored, counted):
+    empty = dict.fromkeys(TaskStats.COUNTERS, 0)
+
+    rows = []
+    for user_id in user_ids:
+        counters = counted.get(user_id, empty)
+        current = stored.get(user_id)
+        if current is None or any(getattr(current, name) != value for name, value in counters.items()):
+            rows.append(TaskStats(user_id=user_id, **counters))
+
+    if rows:
+        # MySQL upserts on the primary key without naming it
+        unique_fields = ['user'] if connection.features.supports_update_conflicts_with_target else None
+        TaskStats.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=unique_fields,
+            update_fields=[*TaskStats.COUNTERS, 'updated_at'],
+        )
+        # The pages showed the wrong counts; make their ETags change
+        TaskStats.objects.filter(user_id__in=[row.user_id for row in rows]).update(version=F('version') + 1)
+    return len(rows)
+
+
+# Cached per-user statistics
+
+def stats_cache_key(user_id):
+    return f'tasks:stats:{user_id}'
+
+
+def _due_aggregates():
+    today = timezone.now().date()
+    return {
+        'overdue': Count('id', filter=Q(due_date__lt=today)),
+        'upcoming': Count('id', filter=Q(due_date__gte=today)),
+    }
+
+
+def _due_tasks(user):
+    # Open tasks due within the week; a range on the partial open-due index
+    return Task.objects.filter(
+        user=user, is_completed=False,
+        due_date__lte=timezone.now().date() + timedelta(days=7),
+    ).order_by()
+
+
+def _user_stats(counters, due):
+    return {
+        'total': counters.total,
+        'completed': counters.completed,
+        'pending': counters.total - counters.completed,
+        'in_progress': counters.status_in_progress,
+        'todo': counters.status_todo,
+        **{f'priority_{priority.key}': getattr(counters, f'priority_{priority.key}') for priority in Task.Priority},
+        **due,
+    }
+
+
+def user_task_stats(user):
+    """
+    Task counters for all of ``user``'s tasks: the TaskStats row plus the
+    date-dependent overdue/upcoming counts, cached until one of the tasks
+    changes (see tasks.signals) or the day rolls over.
+    """
+    key = stats_cache_key(user.pk)
+    today = timezone.now().date()
+
+    cached = cache.get(key)
+    if cached is not None and cached['date'] == today:
+        return cached['stats']
+
+    counters = TaskStats.objects.filter(user=user).first()
+    if counters is None:
+        rebuild_task_stats([user.pk])
+        counters = TaskStats.objects.get(user=user)
+    stats = _user_stats(counters, _due_tasks(user).aggregate(**_due_aggregates()))
+    cache.set(key, {'date': today, 'stats': stats}, settings.TASK_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+async def auser_task_stats(user):
+    key = stats_cache_key(user.pk)
+    today = timezone.now().date()
+
+    cached = await cache.aget(key)
+    if cached is not None and cached['date'] == today:
+        return cached['stats']
+
+    counters = await TaskStats.objects.filter(user=user).afirst()
+    if counters is None:
+        await sync_to_async(rebuild_task_stats)([user.pk])
+        counters = await TaskStats.objects.aget(user=user)
+    stats = _user_stats(counters, await _due_tasks(user).aaggregate(**_due_aggregates()))
+    await cache.aset(key, {'date': today, 'stats': stats}, settings.TASK_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def data_version(user):
+    """``user``'s task data version (0 before their first task write)."""
+    return TaskStats.objects.filter(user=user).values_list('version', flat=True).first() or 0
+
+
+async def adata_version(user):
+    return await TaskStats.objects.filter(user=user).values_list('version', flat=True).afirst() or 0
+
+
+def invalidate_user_task_stats(user_id):
+    cache.delete(stats_cache_key(user_id))
@@ -1,3 +1,1370 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import hashlib
+import os
+import platform
+import re
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, models
+from django.test import (
+    AsyncClient, LiveServerTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .importer import ReadError, read_json
+from .management.commands import build_css
+from .models import Category, Occurrence, Recurrence, Task, TaskStats
+from .pagination import KeysetPaginator, encode_cursor
+from .profiling import StackSampler, TaskSampler
+from .recurrence import expand, occurrence_dates, occurs_on
+from .search import _term_filter, search_tasks, search_terms
+from .stats import rebuild_task_stats
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+class TaskQueryPlanTests(TestCase):
+    """Every Task query issued by the hot views must be served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='pass12345')
+        other = User.objects.create_user(username='other', password='pass12345')
+        today = timezone.now().date()
+        Task.objects.bulk_create([
+            Task(
+                user=owner,
+                title=f'Task {i}',
+                description='Description',
+                priority=Task.Priority.MEDIUM,
+                due_date=today + timedelta(days=i % 40 - 20),
+                status=list(Task.Status)[i % 3],
+                is_completed=i % 3 == 2,
+            )
+            for owner in (cls.user, other)
+            for i in range(60)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def task_query_plans(self, url):
+        """Return the query plan of every tasks_task query issued by ``url``."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                if '"tasks_task"' not in query['sql']:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append(' | '.join(row[-1] for row in cursor.fetchall()))
+        self.assertTrue(plans, f'{url} issued no task queries')
+        return plans
+
+    def assertIndexed(self, url, expected_index=None):
+        plans = self.task_query_plans(url)
+        for plan in plans:
+            self.assertRegex(plan, r'SEARCH tasks_task USING (COVERING )?INDEX', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+        if expected_index is None:
+            return
+        self.assertTrue(
+            any(expected_index in plan for plan in plans),
+            f'{expected_index} not used by {url}: {plans}',
+        )
+
+    def test_my_tasks_uses_created_index(self):
+        self.assertIndexed(reverse('tasks:user_tasks'), 'task_user_created_idx')
+
+    def test_deep_task_page_uses_created_index(self):
+        page = KeysetPaginator(Task.objects.filter(user=self.user), per_page=10).page()
+        page = KeysetPaginator(Task.objects.filter(user=self.user), per_page=10).page(after=page.next_cursor)
+        url = reverse('tasks:user_tasks') + f'?status=todo&after={page.next_cursor}'
+        self.assertIndexed(url, 'task_user_created_idx')
+
+    def test_calendar_uses_due_date_index(self):
+        self.assertIndexed(reverse('tasks:calendar'), 'task_user_due_idx')
+
+    def test_dashboard_uses_created_index(self):
+        self.assertIndexed(reverse('user:user-dashboard'), 'task_user_created_idx')
+
+    def test_profile_stats_are_indexed(self):
+        self.assertIndexed(reverse('user:user-profile'))
+
+    def test_settings_stats_are_indexed(self):
+        self.assertIndexed(reverse('user:settings'))
+
+
+class TaskStatsCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counter', password='pass12345')
+        cls.task = Task.objects.create(
+            user=cls.user, title='Write tests', description='', priority=Task.Priority.LOW,
+            due_date=timezone.now().date(), status=Task.Status.TODO,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def aggregate_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql']]
+
+    def test_warm_dashboard_runs_no_aggregates(self):
+        url = reverse('user:user-dashboard')
+        self.assertEqual(len(self.aggregate_queries(url)), 1)
+        self.assertEqual(self.aggregate_queries(url), [])
+
+    def test_task_changes_invalidate_cached_stats(self):
+        url = reverse('user:user-dashboard')
+        self.assertEqual(self.client.get(url).context['completed_tasks'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('tasks:complete', args=[self.task.pk]))
+        self.assertEqual(self.client.get(url).context['completed_tasks'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('tasks:delete', args=[self.task.pk]))
+            # Until the write commits, readers keep the cached stats
+            self.assertEqual(self.client.get(url).context['total_tasks'], 1)
+        self.assertEqual(self.client.get(url).context['total_tasks'], 0)
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pager', password='pass12345')
+        Task.objects.bulk_create([
+            Task(user=cls.user, title=f'Task {i}', description='', priority=Task.Priority.LOW,
+                 due_date=timezone.now().date(), status=Task.Status.TODO)
+            for i in range(25)
+        ])
+        # Identical timestamps force the id tie-breaker to do its job
+        Task.objects.filter(user=cls.user, id__lte=Task.objects.order_by('id')[9].id).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = KeysetPaginator(Task.objects.filter(user=self.user), per_page=10)
+        expected = list(Task.objects.filter(user=self.user).order_by('-created_at', '-id'))
+
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        self.assertEqual([task for page in pages for task in page], expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginator.page(before=pages[-1].previous_cursor)
+        self.assertEqual(back.object_list, pages[1].object_list)
+        first = paginator.page(before=back.previous_cursor)
+        self.assertEqual(first.object_list, pages[0].object_list)
+        self.assertFalse(first.has_previous)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(Task.objects.filter(user=self.user), per_page=10)
+        first = paginator.page().object_list
+        self.assertEqual(paginator.page(after='not-a-cursor').object_list, first)
+        for values in (['x', 'y'], ['2026-01-01T00:00:00+00:00', 'y'], [None, 1], [{}, []], [1]):
+            with self.subTest(values=values):
+                cursor = encode_cursor(values)
+                self.assertEqual(paginator.page(after=cursor).object_list, first)
+                self.assertEqual(paginator.page(before=cursor).object_list, first)
+
+        self.client.force_login(self.user)
+        cursor = encode_cursor(['x', 'y'])
+        self.assertEqual(self.client.get(reverse('tasks:user_tasks'), {'after': cursor}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('tasks:api_list'), {'before': cursor}).status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('tasks:user_tasks'), {'search': 'Task', 'after': cursor}).status_code, 200,
+        )
+
+    def test_list_view_keeps_filters_in_page_links(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('tasks:user_tasks'), {'search': 'Task', 'status': 'todo'})
+        next_cursor = response.context['page'].next_cursor
+        self.assertContains(response, f'?search=Task&amp;status=todo&amp;after={next_cursor}')
+        response = self.client.get(reverse('tasks:user_tasks'), {'search': 'Task', 'status': 'todo', 'after': next_cursor})
+        self.assertEqual(len(response.context['page']), 5)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Exercises the SQLite FTS5 backend')
+class TaskSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='searcher', password='pass12345')
+        other = User.objects.create_user(username='stranger', password='pass12345')
+        today = timezone.now().date()
+
+        def task(owner, title, description='', category=''):
+            return Task.objects.create(
+                user=owner, title=title, description=description, priority=Task.Priority.LOW,
+                due_date=today, status=Task.Status.TODO, category=Category.for_name(owner, category),
+            )
+
+        cls.report = task(cls.user, 'Quarterly report', 'Numbers for the board')
+        cls.mention = task(cls.user, 'Call accountant', 'Ask about the quarterly report figures')
+        cls.groceries = task(cls.user, 'Groceries', 'Milk and eggs', category='Home')
+        task(other, 'Quarterly report', 'Somebody else')
+
+    def search(self, query):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('tasks:user_tasks'), {'search': query})
+        return list(response.context['tasks'])
+
+    def test_prefix_match_ranks_title_hits_first(self):
+        self.assertEqual(self.search('quart rep'), [self.report, self.mention])
+
+    def test_matches_category(self):
+        self.assertEqual(self.search('home'), [self.groceries])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.groceries.title = 'Hardware store'
+        self.groceries.save()
+        self.assertEqual(self.search('hardware'), [self.groceries])
+        self.assertEqual(self.search('groceries'), [])
+
+        self.groceries.delete()
+        self.assertEqual(self.search('hardware'), [])
+
+    def test_index_follows_category_renames(self):
+        self.groceries.category.name = 'Errands'
+        self.groceries.category.save()
+        self.assertEqual(self.search('errands'), [self.groceries])
+        self.assertEqual(self.search('home'), [])
+
+    def test_punctuation_only_query_does_not_error(self):
+        self.assertEqual(self.search('"*'), [])
+
+    def test_terms_may_match_different_fields(self):
+        self.assertEqual(self.search('milk home'), [self.groceries])
+        self.assertEqual(self.search('ilk'), [])
+
+    def test_other_backends_match_like_fts(self):
+        tasks = Task.objects.filter(user=self.user)
+        for query in ('quart rep', 'milk home', 'hom', 'ilk', 'board figures', 'report eggs'):
+            with self.subTest(query=query):
+                self.assertQuerySetEqual(
+                    tasks.filter(*(_term_filter(term, 'other', self.user.pk) for term in search_terms(query))),
+                    search_tasks(tasks, query, self.user.pk), ordered=False,
+                )
+
+
+    def test_category_matches_need_no_join(self):
+        # An OR across a join would keep Postgres and MySQL off their full-text indexes
+        tasks = Task.objects.filter(user=self.user)
+        for vendor in ('postgresql', 'mysql', 'other'):
+            with self.subTest(vendor=vendor):
+                sql = str(tasks.filter(_term_filter('home', vendor, self.user.pk)).query)
+                self.assertNotIn('JOIN', sql)
+                # Only the owner's categories are read
+                self.assertRegex(sql, rf'(U0|"tasks_category")\."user_id" = {self.user.pk}\b')
+
+class CalendarGridTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='pass12345')
+        cls.first = date(2026, 3, 1)
+        Task.objects.bulk_create([
+            Task(user=cls.user, title=f'Task {i}', description='Long text', priority=Task.Priority.LOW,
+                 due_date=cls.first if i < 5 else date(2026, 3, 20), status=Task.Status.TODO)
+            for i in range(6)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_month(self, year=2026, month=3):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('tasks:calendar'), {'year': year, 'month': month})
+        self.assertEqual(response.status_code, 200)
+        task_queries = [q['sql'] for q in ctx.captured_queries if '"tasks_task"' in q['sql']]
+        cells = {cell['day']: cell for week in response.context['calendar'] for cell in week if cell}
+        return cells, task_queries
+
+    def test_counts_days_without_loading_descriptions(self):
+        cells, queries = self.get_month()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0])
+        self.assertEqual((cells[1]['count'], len(cells[1]['tasks']), cells[1]['more']), (5, 3, 2))
+        self.assertEqual(cells[20]['count'], 1)
+        self.assertEqual(cells[2]['tasks'], [])
+
+    def test_month_is_cached_until_a_task_moves_out(self):
+        self.get_month()
+        self.assertEqual(self.get_month()[1], [])
+
+        task = Task.objects.filter(user=self.user, due_date=self.first).first()
+        task.due_date = '2026-04-02'
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+
+        cells, queries = self.get_month()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(cells[1]['count'], 4)
+        self.assertEqual(self.get_month(2026, 4)[0][2]['count'], 1)
+
+
+class RecurrenceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='repeater', password='pass12345')
+        cls.weekly = Recurrence.objects.create(
+            user=cls.user, title='Water plants', priority=Task.Priority.HIGH,
+            frequency=Recurrence.Frequency.WEEKLY, starts_on=date(2026, 3, 2),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def occurrence_url(self, name, day, recurrence=None):
+        return reverse(name, args=[(recurrence or self.weekly).pk, day])
+
+    def test_dates_follow_the_rule(self):
+        def rule(frequency, starts_on, interval=1, ends_on=None):
+            return Recurrence(frequency=frequency, starts_on=starts_on, interval=interval, ends_on=ends_on)
+
+        daily = rule(Recurrence.Frequency.DAILY, date(2026, 3, 1), interval=3, ends_on=date(2026, 3, 12))
+        self.assertEqual(
+            list(occurrence_dates(daily, date(2026, 2, 1), date(2026, 3, 31))),
+            [date(2026, 3, 1), date(2026, 3, 4), date(2026, 3, 7), date(2026, 3, 10)],
+        )
+        self.assertEqual(
+            list(occurrence_dates(self.weekly, date(2026, 3, 10), date(2026, 3, 23))),
+            [date(2026, 3, 16), date(2026, 3, 23)],
+        )
+        # The 31st falls back to each shorter month's last day
+        monthly = rule(Recurrence.Frequency.MONTHLY, date(2026, 1, 31))
+        self.assertEqual(
+            list(occurrence_dates(monthly, date(2026, 1, 1), date(2026, 5, 31))),
+            [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30), date(2026, 5, 31)],
+        )
+        self.assertFalse(occurs_on(self.weekly, date(2026, 3, 3)))
+
+    def test_expanding_a_late_window_does_not_walk_the_series(self):
+        daily = Recurrence(frequency=Recurrence.Frequency.DAILY, starts_on=date(1990, 1, 1), interval=1)
+        dates = occurrence_dates(daily, date(2026, 3, 1), date(2026, 3, 7))
+        self.assertEqual(next(dates), date(2026, 3, 1))
+        self.assertEqual(len(list(dates)), 6)
+
+    def test_calendar_shows_open_occurrences(self):
+        response = self.client.get(reverse('tasks:calendar'), {'year': 2026, 'month': 3})
+        cells = {cell['day']: cell for week in response.context['calendar'] for cell in week if cell}
+        self.assertEqual([day for day, cell in cells.items() if cell['count']], [2, 9, 16, 23, 30])
+        self.assertEqual(cells[9]['tasks'][0]['title'], 'Water plants')
+        self.assertEqual(response.context['task_total'], 5)
+        self.assertContains(response, self.occurrence_url('tasks:occurrence', '2026-03-09'))
+
+    def test_completing_writes_one_task(self):
+        url = self.occurrence_url('tasks:complete_occurrence', '2026-03-09')
+        self.client.post(url)
+        self.client.post(url)
+
+        task = Task.objects.get(user=self.user)
+        self.assertEqual((task.title, task.due_date, task.is_completed), ('Water plants', date(2026, 3, 9), True))
+        self.assertEqual(task.occurrence.recurrence, self.weekly)
+        self.assertEqual(TaskStats.objects.get(user=self.user).completed, 1)
+        self.assertNotIn(date(2026, 3, 9), [o['date'] for o in expand(self.user.pk, date(2026, 3, 1), date(2026, 3, 31))])
+        self.assertRedirects(
+            self.client.get(self.occurrence_url('tasks:occurrence', '2026-03-09')),
+            reverse('tasks:view', args=[task.pk]), fetch_redirect_response=False,
+        )
+
+    def test_editing_opens_the_written_task(self):
+        response = self.client.post(self.occurrence_url('tasks:edit_occurrence', '2026-03-16'))
+        task = Task.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('tasks:edit', args=[task.pk]), fetch_redirect_response=False)
+        self.assertFalse(task.is_completed)
+
+    def test_skipped_and_deleted_dates_stay_gone(self):
+        calendar_url = reverse('tasks:calendar')
+        etag = self.client.get(calendar_url)['ETag']
+        self.client.post(self.occurrence_url('tasks:skip_occurrence', '2026-03-16'))
+        # The first page after the write renders its message
+        self.client.get(calendar_url)
+        self.assertNotEqual(self.client.get(calendar_url)['ETag'], etag)
+        self.assertEqual(self.client.get(self.occurrence_url('tasks:occurrence', '2026-03-16')).status_code, 404)
+
+        self.client.post(self.occurrence_url('tasks:complete_occurrence', '2026-03-23'))
+        Task.objects.get(user=self.user).delete()
+        self.assertEqual(Occurrence.objects.filter(recurrence=self.weekly, task=None).count(), 2)
+        self.assertEqual(
+            [o['date'] for o in expand(self.user.pk, date(2026, 3, 1), date(2026, 3, 31))],
+            [date(2026, 3, 2), date(2026, 3, 9), date(2026, 3, 30)],
+        )
+
+    def test_rules_are_cached_until_they_change(self):
+        start, end = date(2026, 3, 1), date(2026, 3, 31)
+        expand(self.user.pk, start, end)
+        with self.assertNumQueries(1):
+            expand(self.user.pk, start, end)
+
+        self.weekly.ends_on = date(2026, 3, 15)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.weekly.save()
+        self.assertEqual([o['date'] for o in expand(self.user.pk, start, end)], [date(2026, 3, 2), date(2026, 3, 9)])
+
+    def test_creating_a_repeating_task_writes_no_task(self):
+        response = self.client.post(reverse('tasks:create'), {
+            'title': 'Report', 'description': '', 'due_date': '2026-01-31', 'priority': 'low',
+            'status': 'todo', 'category': 'Work', 'repeat': 'monthly', 'repeat_interval': '2',
+        })
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        recurrence = Recurrence.objects.get(user=self.user, title='Report')
+        self.assertEqual((recurrence.interval, recurrence.category.name), (2, 'Work'))
+        self.assertEqual(recurrence.describe(), 'Every 2 months')
+        self.assertFalse(Task.objects.filter(user=self.user).exists())
+
+    def test_only_the_owner_reaches_real_dates(self):
+        self.assertEqual(self.client.get(self.occurrence_url('tasks:occurrence', '2026-03-10')).status_code, 404)
+        self.assertEqual(self.client.get(self.occurrence_url('tasks:occurrence', 'someday')).status_code, 404)
+
+        self.client.force_login(User.objects.create_user(username='stranger', password='pass12345'))
+        self.assertEqual(self.client.get(self.occurrence_url('tasks:occurrence', '2026-03-09')).status_code, 404)
+        self.client.post(reverse('tasks:delete_recurrence', args=[self.weekly.pk]))
+        self.assertTrue(Recurrence.objects.filter(pk=self.weekly.pk).exists())
+
+
+class TaskApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='integrator', password='pass12345')
+        cls.task = Task.objects.create(
+            user=cls.user, title='Existing', description='', priority=Task.Priority.LOW,
+            due_date=date(2026, 5, 1), status=Task.Status.TODO,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def bulk(self, payload):
+        return self.client.post(reverse('tasks:api_bulk'), payload, content_type='application/json')
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('tasks:api_list')).status_code, 401)
+
+    def test_bulk_writes_in_few_queries(self):
+        new = [{'title': f'Imported {i}', 'priority': 'medium', 'due_date': '2026-05-02', 'status': 'todo'}
+               for i in range(200)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.bulk({'create': new, 'update': [{'id': self.task.pk, 'is_completed': True}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['created']), 200)
+        self.assertLess(len(ctx.captured_queries), 12)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.is_completed)
+
+        response = self.bulk({'delete': response.json()['created']})
+        self.assertEqual(response.json()['deleted'], 200)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+
+    def test_choices_and_categories_use_keys_and_names(self):
+        response = self.bulk({'create': [
+            {'title': 'A', 'priority': 'high', 'due_date': '2026-05-02', 'status': 'in_progress', 'category': 'Work'},
+            {'title': 'B', 'priority': 'low', 'due_date': '2026-05-02', 'status': 'todo', 'category': ' work '},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 1)
+
+        first = self.client.get(reverse('tasks:api_detail', args=[response.json()['created'][0]])).json()
+        self.assertEqual(
+            (first['priority'], first['status'], first['category']), ('high', 'in_progress', 'Work'),
+        )
+        rows = self.client.get(reverse('tasks:api_list'), {'status': 'todo'}).json()['results']
+        self.assertEqual([(row['title'], row['category']) for row in rows], [('B', 'Work'), ('Existing', '')])
+
+    def test_invalid_item_writes_nothing(self):
+        response = self.bulk({'create': [
+            {'title': 'Fine', 'priority': 'low', 'due_date': '2026-05-02', 'status': 'todo'},
+            {'title': 'Broken', 'priority': 'urgent', 'due_date': 'soon', 'status': 'todo'},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']['create']['1']), {'priority', 'due_date'})
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+
+    def test_missing_update_ids_write_nothing(self):
+        response = self.bulk({
+            'create': [{'title': 'New', 'priority': 'low', 'due_date': '2026-05-02', 'status': 'todo', 'category': 'Fresh'}],
+            'update': [{'id': self.task.pk + 1000, 'category': 'Stale'}],
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Category.objects.filter(user=self.user).exists())
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+
+    def test_booleans_are_not_ids(self):
+        for payload in ({'update': [{'id': True, 'title': 'x'}]}, {'delete': [False]}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.bulk(payload).status_code, 400)
+
+    def test_etags_differ_between_users(self):
+        other = User.objects.create_user(username='neighbour', password='pass12345')
+        TaskStats.objects.filter(user=other).update(version=TaskStats.objects.get(user=self.user).version)
+        url = reverse('tasks:api_list')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_only_text_fields_take_empty_strings(self):
+        detail = reverse('tasks:api_detail', args=[self.task.pk])
+        for name in ('is_completed', 'priority', 'status', 'due_date'):
+            with self.subTest(name=name):
+                response = self.client.patch(detail, {name: ''}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(name, response.json()['errors'])
+                response = self.bulk({'update': [{'id': self.task.pk, name: ''}]})
+                self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(detail, {'description': '', 'category': ''}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_update_refreshes_cached_calendar_and_stats(self):
+        self.client.get(reverse('tasks:calendar'), {'year': 2026, 'month': 5})
+        self.client.get(reverse('user:user-dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk({'update': [{'id': self.task.pk, 'due_date': '2026-06-03', 'is_completed': True}]})
+        may = self.client.get(reverse('tasks:calendar'), {'year': 2026, 'month': 5})
+        self.assertEqual(may.context['task_total'], 0)
+        self.assertEqual(self.client.get(reverse('user:user-dashboard')).context['completed_tasks'], 1)
+
+    def test_list_and_detail_answer_conditional_gets(self):
+        url = reverse('tasks:api_list')
+        response = self.client.get(url)
+        self.assertEqual([row['title'] for row in response.json()['results']], ['Existing'])
+        self.assertNotIn(' ', response.content.decode().replace('Existing', ''))
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        # The ETag comes from the data version, not from scanning the tasks
+        self.assertFalse([q for q in ctx.captured_queries if '"tasks_task"' in q['sql']])
+
+        detail = reverse('tasks:api_detail', args=[self.task.pk])
+        detail_etag = self.client.get(detail)['ETag']
+        self.client.patch(detail, {'title': 'Renamed'}, content_type='application/json')
+        self.assertEqual(self.client.get(detail, headers={'If-None-Match': detail_etag}).status_code, 200)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        self.bulk({'delete': [self.task.pk]})
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class TaskExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='pass12345')
+        Task.objects.bulk_create([
+            Task(user=cls.user, title=f'Task {i}', description='Line one\nline, two', priority=Task.Priority.LOW,
+                 due_date=date(2026, 5, 1), status=Task.Status.TODO if i % 2 else Task.Status.IN_PROGRESS)
+            for i in range(1200)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_csv_streams_every_matching_row(self):
+        response = self.client.get(reverse('tasks:export'), {'status': 'todo'})
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual(len(rows), 600)
+        self.assertEqual(rows[0]['description'], 'Line one\nline, two')
+
+    def test_ndjson_lines_are_json(self):
+        response = self.client.get(reverse('tasks:export'), {'format': 'ndjson', 'search': 'Task 1199'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Task 1199'])
+
+    def test_admin_export_is_staff_only(self):
+        url = reverse('user:export-user-tasks', args=[self.user.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        staff = User.objects.create_user(username='boss', password='pass12345', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url, {'format': 'ndjson'})['Content-Type'], 'application/x-ndjson')
+
+
+class ImportTasksCommandTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='migrator', password='pass12345')
+
+    def run_import(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_tasks', path, '--user', 'migrator', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def write(self, name, content):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_csv_rows_are_normalised_and_batched(self):
+        path = self.write('tasks.csv', (
+            'title,priority,status,due_date,category\n'
+            'Ship it,Urgent,Done,2026-05-01T09:30:00,Work\n'
+            'Plan,2,In Progress,2026-05-02,\n'
+            'Broken,high,todo,someday,\n'
+            'Later,,,2026-06-01,\n'
+        ))
+        with CaptureQueriesContext(connection) as ctx:
+            out, err = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Imported 3 tasks', out)
+        self.assertIn("Row 3 skipped: invalid due_date 'someday'", err)
+        self.assertEqual(sum('INSERT INTO "tasks_task"' in q['sql'] for q in ctx.captured_queries), 2)
+        self.assertEqual(list(Category.objects.filter(user=self.user).values_list('name', flat=True)), ['Work'])
+
+        tasks = Task.objects.filter(user=self.user).order_by('due_date')
+        self.assertEqual(
+            [(t.priority_key, t.status_key, t.is_completed, t.due_date) for t in tasks],
+            [('high', 'completed', True, date(2026, 5, 1)),
+             ('medium', 'in_progress', False, date(2026, 5, 2)),
+             ('medium', 'todo', False, date(2026, 6, 1))],
+        )
+
+    def test_json_array_is_read_incrementally(self):
+        rows = [{'title': f'Task {i}', 'due_date': '2026-05-01', 'description': 'x' * 100} for i in range(50)]
+        path = self.write('tasks.json', json.dumps(rows, indent=2))
+        out, _ = self.run_import(path, '--dry-run')
+        self.assertIn('Validated 50 tasks', out)
+        self.assertFalse(Task.objects.exists())
+
+        with open(path) as file:
+            self.assertEqual(len(list(read_json(file, buffer_size=64))), 50)
+
+    def test_malformed_records(self):
+        path = self.write('tasks.ndjson', (
+            '{"title": "Ok", "due_date": "2026-05-01"}\n\n{"title": "Cut off\n{"title": "Fine", "due_date": "2026-05-02"}\n'
+        ))
+        out, err = self.run_import(path)
+        self.assertIn('Imported 2 tasks', out)
+        self.assertIn('Row 2 skipped: line 3 is not valid JSON', err)
+
+        path = self.write('tasks.json', '[{"title": "Ok", "due_date": "2026-05-01"}, {"title": nope}, {}]')
+        with self.assertRaisesMessage(CommandError, 'Item 2 is not valid JSON'):
+            self.run_import(path, '--batch-size', '1')
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 3)
+
+        # A broken item is not buffered to the end of the file
+        item = json.dumps({'title': 'Task', 'due_date': '2026-05-01', 'description': 'x' * 100})
+        with io.StringIO('[{"title": ' + ', '.join([item] * 1000) + ']') as file:
+            with self.assertRaisesMessage(ReadError, 'longer than 1000 characters'):
+                list(read_json(file, buffer_size=64, max_item_size=1000))
+
+        with self.assertRaisesMessage(CommandError, '--progress-every must be positive'):
+            self.run_import(path, '--progress-every', '0')
+
+    def test_strict_mode_stops_at_first_bad_row(self):
+        path = self.write('tasks.ndjson', '{"title": "Ok", "due_date": "2026-05-01"}\n{"title": ""}\n')
+        with self.assertRaisesMessage(CommandError, 'Row 2: title is required'):
+            self.run_import(path, '--strict')
+
+
+class PerfToolsTests(TransactionTestCase):
+    """seed_perf_data and bench; bench's client threads need committed data."""
+
+    def seed(self, prefix, *args):
+        call_command(
+            'seed_perf_data', '--users', '3', '--min-tasks', '2', '--max-tasks', '30',
+            '--start', '2026-05-01', '--prefix', prefix, *args, stdout=io.StringIO(),
+        )
+        return Task.objects.filter(user__username__startswith=f'{prefix}-').order_by('user__username', 'id')
+
+    def test_seed_is_deterministic_and_keeps_counters(self):
+        first = list(self.seed('a').values_list('title', 'status', 'priority', 'due_date', 'category__name'))
+        second = list(self.seed('b').values_list('title', 'status', 'priority', 'due_date', 'category__name'))
+        self.assertEqual(first, second)
+        self.assertEqual(User.objects.filter(username='a-staff', is_staff=True).count(), 1)
+        self.assertEqual(rebuild_task_stats(list(User.objects.values_list('id', flat=True))), 0)
+
+        with self.assertRaises(CommandError):
+            self.seed('a')
+        self.assertEqual(len(self.seed('a', '--clear', '--seed', '2')), TaskStats.objects.filter(
+            user__username__startswith='a-').aggregate(total=models.Sum('total'))['total'])
+
+    def test_bench_reports_latency_and_queries(self):
+        self.seed('perf')
+        out = io.StringIO()
+        call_command('bench', 'user_tasks', 'admin_profile', '--requests', '6', '--concurrency', '2',
+                     '--warmup', '1', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['targets']), {'user_tasks', 'admin_profile'})
+        for result in report['targets'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+            self.assertGreater(result['queries_per_request'], 0)
+
+    def test_bench_needs_seeded_users(self):
+        with self.assertRaises(CommandError):
+            call_command('bench', stdout=io.StringIO())
+
+    def test_bench_templates_caches_like_production_under_debug(self):
+        debug_caches = {**settings.CACHES, 'templates': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        out = io.StringIO()
+        with override_settings(CACHES=debug_caches):
+            call_command('bench_templates', 'home/home.html', '--iterations', '20', stdout=out)
+            self.assertEqual(type(caches['templates']).__name__, 'DummyCache')
+        # The home page body is one fragment: served from the cache when warm
+        compile_and_render, cold, warm = map(float, re.findall(r'([\d.]+) ms', out.getvalue()))
+        self.assertLess(cold, compile_and_render)
+        self.assertLess(warm, cold / 2)
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+
+    def test_reads_and_writes_against_a_server(self):
+        user = User.objects.create_user(username='loaded', password='pass12345')
+        task = Task.objects.create(user=user, title='Toggle me', due_date=date(2026, 5, 1))
+        out = io.StringIO()
+        call_command(
+            'loadtest', '--url', self.live_server_url, '--username', 'loaded', '--path', '/task/my-tasks/',
+            '--requests', '4', '--concurrency', '2', '--write-every', '2', stdout=out,
+        )
+        result = json.loads(out.getvalue())[self.live_server_url]['/task/my-tasks/']
+        self.assertEqual((result['requests'], result['errors']), (4, 0))
+        self.assertGreater(result['queries_per_request'], 0)
+        # Requests 1 and 3 were PATCHes setting is_completed
+        task.refresh_from_db()
+        self.assertTrue(task.is_completed)
+
+
+class TaskStatsCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tallied', password='pass12345')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def counters(self):
+        stats = TaskStats.objects.get(user=self.user)
+        return {name: getattr(stats, name) for name in TaskStats.COUNTERS if getattr(stats, name)}
+
+    def test_views_keep_counters_in_step(self):
+        self.client.post(reverse('tasks:create'), {
+            'title': 'Draft', 'description': 'd', 'priority': 'high',
+            'due_date': '2026-05-01', 'status': 'todo', 'category': 'c',
+        })
+        task = Task.objects.get(user=self.user)
+        self.assertEqual(self.counters(), {'total': 1, 'status_todo': 1, 'priority_high': 1})
+
+        self.client.post(reverse('tasks:complete', args=[task.pk]))
+        self.assertEqual(self.counters(), {'total': 1, 'completed': 1, 'status_completed': 1, 'priority_high': 1})
+
+        self.client.post(reverse('tasks:edit', args=[task.pk]), {
+            'title': 'Draft', 'description': 'd', 'priority': 'low',
+            'due_date': '2026-05-01', 'status': 'in_progress', 'category': 'C',
+        })
+        self.assertEqual(self.counters(), {'total': 1, 'status_in_progress': 1, 'priority_low': 1})
+        # Category names are matched regardless of case
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 1)
+
+        # A deferred load still subtracts the stored values
+        task = Task.objects.only('id').get(pk=task.pk)
+        task.priority = Task.Priority.MEDIUM
+        task.save(update_fields=['priority'])
+        self.assertEqual(self.counters(), {'total': 1, 'status_in_progress': 1, 'priority_medium': 1})
+
+        self.client.post(reverse('tasks:delete', args=[task.pk]))
+        self.assertEqual(self.counters(), {})
+
+    def test_stale_copies_do_not_count_a_change_twice(self):
+        task = Task.objects.create(
+            user=self.user, title='Shared', description='', priority=Task.Priority.LOW,
+            due_date=date(2026, 5, 1), status=Task.Status.TODO,
+        )
+        # Two requests load the open task, then both mark it done
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        for copy in (first, second):
+            copy.is_completed, copy.status = True, Task.Status.COMPLETED
+            copy.save()
+        self.assertEqual(self.counters(), {'total': 1, 'completed': 1, 'status_completed': 1, 'priority_low': 1})
+
+        # A copy whose row was deleted meanwhile is inserted again and counted once
+        Task.objects.filter(pk=task.pk).delete()
+        first.save()
+        self.assertEqual(self.counters(), {'total': 1, 'completed': 1, 'status_completed': 1, 'priority_low': 1})
+
+        # An instance built with the pk of the stored row updates it
+        Task(pk=task.pk, user=self.user, title='Shared', description='', priority=Task.Priority.HIGH,
+             due_date=date(2026, 5, 1), status=Task.Status.TODO, created_at=task.created_at).save()
+        self.assertEqual(self.counters(), {'total': 1, 'status_todo': 1, 'priority_high': 1})
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_rebuild_locks_the_rows_before_counting(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild_task_stats([self.user.pk])
+        sql = [q['sql'] for q in ctx.captured_queries]
+        locked = next(i for i, query in enumerate(sql) if 'tasks_taskstats' in query and 'FOR UPDATE' in query)
+        counted = next(i for i, query in enumerate(sql) if query.startswith('SELECT') and 'tasks_task"' in query)
+        self.assertLess(locked, counted)
+
+    def test_bulk_api_and_rebuild_repair_drift(self):
+        self.client.post(reverse('tasks:api_bulk'), {'create': [
+            {'title': f'T{i}', 'priority': 'low', 'due_date': '2026-05-01', 'status': 'todo'} for i in range(3)
+        ]}, content_type='application/json')
+        self.assertEqual(self.counters(), {'total': 3, 'status_todo': 3, 'priority_low': 3})
+
+        Task.objects.filter(user=self.user).update(status=Task.Status.IN_PROGRESS)
+        out = io.StringIO()
+        call_command('rebuild_task_stats', stdout=out)
+        self.assertIn('repaired 1 task stat rows', out.getvalue())
+        self.assertEqual(self.counters(), {'total': 3, 'status_in_progress': 3, 'priority_low': 3})
+
+    def test_bulk_api_delete_updates_counters_once(self):
+        tasks = Task.objects.bulk_create(
+            Task(user=self.user, title=f'T{i}', description='', priority=Task.Priority.LOW,
+                 due_date=timezone.now().date(), is_completed=i == 0)
+            for i in range(3)
+        )
+        rebuild_task_stats([self.user.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('tasks:api_bulk'), {'delete': [task.pk for task in tasks[:2]]},
+                             content_type='application/json')
+        self.assertEqual(self.counters(), {'total': 1, 'status_todo': 1, 'priority_low': 1})
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "tasks_taskstats"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_deleting_the_owner_skips_counter_updates(self):
+        Task.objects.create(user=self.user, title='One', description='', priority=Task.Priority.LOW,
+                            due_date=timezone.now().date(), status=Task.Status.TODO)
+        with CaptureQueriesContext(connection) as ctx:
+            self.user.delete()
+        self.assertFalse(any(q['sql'].startswith('UPDATE "tasks_taskstats"') for q in ctx.captured_queries))
+        self.assertFalse(TaskStats.objects.exists())
+        # Without receivers on Task the cascade reads only the task ids
+        self.assertFalse(any('"tasks_task"."title"' in q['sql'] for q in ctx.captured_queries))
+        self.assertFalse(Task.objects.exists())
+
+    def test_dashboard_reads_the_stats_row(self):
+        Task.objects.create(user=self.user, title='One', description='', priority=Task.Priority.LOW,
+                            due_date=timezone.now().date(), status=Task.Status.TODO)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('user:user-dashboard'))
+        self.assertEqual(response.context['total_tasks'], 1)
+        self.assertEqual(response.context['overdue_tasks'], 0)
+        full_counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql'] and 'due_date' not in q['sql']]
+        self.assertEqual(full_counts, [])
+
+
+class ConditionalPageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='revisitor', password='pass12345')
+        cls.task = Task.objects.create(
+            user=cls.user, title='Revisit', description='', priority=Task.Priority.LOW,
+            due_date=date(2026, 5, 1), status=Task.Status.TODO,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def revisit(self, url, **params):
+        # The first visit may set the CSRF cookie, which is part of the ETag
+        self.client.get(url, params)
+        first = self.client.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(url, params, headers={'If-None-Match': first['ETag']})
+
+    def test_anonymous_home_is_publicly_cacheable(self):
+        first, again = self.revisit(reverse('home'))
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('s-maxage=300', first['Cache-Control'])
+        self.assertEqual(first['Vary'], 'Cookie')
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.templates, [])
+
+    def test_home_with_a_session_or_messages_is_never_shared(self):
+        self.client.force_login(self.user)
+        signed_in = self.client.get(reverse('home'))
+        self.client.logout()
+        self.client.cookies[CookieStorage.cookie_name] = 'pending'
+        with_messages = self.client.get(reverse('home'))
+        for response in (signed_in, with_messages):
+            with self.subTest(cookies=sorted(response.wsgi_request.COOKIES)):
+                self.assertIn('private', response['Cache-Control'])
+                self.assertNotIn('s-maxage', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_unchanged_pages_answer_304_without_rendering(self):
+        self.client.force_login(self.user)
+        for url in (reverse('user:user-dashboard'), reverse('tasks:calendar'), reverse('tasks:user_tasks'),
+                    reverse('tasks:view', args=[self.task.pk]), reverse('home')):
+            with self.subTest(url=url):
+                first, again = self.revisit(url)
+                self.assertIn('private', first['Cache-Control'])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.templates, [])
+
+    def test_task_writes_change_the_etag(self):
+        self.client.force_login(self.user)
+        dashboard = reverse('user:user-dashboard')
+        detail = reverse('tasks:view', args=[self.task.pk])
+        etags = {url: self.client.get(url)['ETag'] for url in (dashboard, detail)}
+
+        self.task.title = 'Revisited'
+        self.task.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Revisited')
+
+    def test_category_renames_change_the_etag(self):
+        category = Category.for_name(self.user, 'Garden')
+        self.task.category = category
+        self.task.save()
+        self.client.force_login(self.user)
+        urls = (
+            reverse('tasks:user_tasks'), reverse('tasks:view', args=[self.task.pk]),
+            reverse('tasks:api_list'), reverse('tasks:api_detail', args=[self.task.pk]),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+
+        category.name = 'Allotment'
+        category.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Allotment')
+
+    def test_pending_messages_are_always_rendered(self):
+        self.client.force_login(self.user)
+        url = reverse('tasks:user_tasks')
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('tasks:complete', args=[self.task.pk]))
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertContains(response, 'Task marked as completed.')
+
+
+class TemplateFragmentTests(TestCase):
+
+    def test_cached_header_is_per_user(self):
+        alice = User.objects.create_user(username='alice', password='pass12345')
+        boss = User.objects.create_user(username='boss', password='pass12345', is_staff=True)
+        for user, shown, hidden in ((alice, 'alice', 'boss'), (boss, 'boss', 'alice'), (alice, 'alice', 'boss')):
+            with self.subTest(user=user.username):
+                self.client.force_login(user)
+                response = self.client.get(reverse('home'))
+                self.assertContains(response, f'>{shown}</p>')
+                self.assertNotContains(response, f'>{hidden}</p>')
+                self.assertEqual(user.is_staff, reverse('user:admin-profile') in response.content.decode())
+
+    def test_pages_use_the_built_stylesheet(self):
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'href="/static/css/app.css"')
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+
+    def test_stylesheet_loads_nothing_from_other_hosts(self):
+        source = (settings.BASE_DIR / 'assets' / 'css' / 'app.css').read_text(encoding='utf-8')
+        self.assertNotRegex(source, r'url\(\s*[\'"]?(https?:)?//')
+
+
+ASSET = build_css.CLI_ASSETS.get((platform.system().lower(), platform.machine().lower()))
+
+
+@skipUnless(ASSET, "no Tailwind standalone build for this platform")
+class BuildCssTests(TestCase):
+
+    def setUp(self):
+        self.base_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.cli = self.base_dir / '.tailwind' / build_css.TAILWIND_VERSION / ASSET
+        self.cli.parent.mkdir(parents=True)
+        self.cli.write_bytes(b'tailwindcss')
+
+    def download_cli(self, digest):
+        with override_settings(BASE_DIR=self.base_dir, TAILWIND_CLI_SHA256=digest):
+            return build_css.Command().download_cli()
+
+    def test_runs_a_cli_with_the_pinned_digest(self):
+        digest = hashlib.sha256(b'tailwindcss').hexdigest()
+        self.assertEqual(self.download_cli(digest.upper()), str(self.cli))
+
+    def test_refuses_a_cli_with_another_digest(self):
+        for digest in ('', hashlib.sha256(b'something else').hexdigest()):
+            with self.subTest(digest=digest), self.assertRaisesMessage(CommandError, 'TAILWIND_CLI_SHA256'):
+                self.download_cli(digest)
+
+
+class RequestMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='pass12345')
+        cls.staff = User.objects.create_user(username='boss', password='pass12345', is_staff=True)
+        Task.objects.create(user=cls.user, title='Write report', due_date=date.today())
+
+    def queries_reported(self, response):
+        db = response.headers['Server-Timing'].split(',')[0]
+        return int(db.split('desc="')[1].split()[0])
+
+    def test_server_timing_counts_the_queries(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tasks:user_tasks'))
+        self.assertEqual(self.queries_reported(response), len(queries))
+
+    async def test_async_views_are_counted(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('user:user-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.queries_reported(response), 0)
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_views_over_the_query_budget_warn(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('tasks.metrics', 'WARNING') as logs:
+            self.client.get(reverse('tasks:user_tasks'))
+        self.assertIn('/task/my-tasks/ ran', logs.output[0])
+
+    def test_metrics_are_for_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.user)
+        self.client.get(reverse('tasks:user_tasks'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(response, 'view="tasks:user_tasks",method="GET",status="200"}')
+        self.assertContains(response, '# TYPE taskmanager_request_duration_seconds histogram')
+
+
+class RequestProfilerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='pass12345')
+        cls.staff = User.objects.create_user(username='boss', password='pass12345', is_staff=True)
+        Task.objects.create(user=cls.user, title='Write report', due_date=date.today())
+
+    def setUp(self):
+        self.profile_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(PROFILING=True, PROFILE_DIR=self.profile_dir, PROFILE_INTERVAL=0.001))
+        self.client.force_login(self.user)
+
+    def token(self):
+        staff = self.client_class()
+        staff.force_login(self.staff)
+        return staff.get(reverse('profiles')).context['token']
+
+    def test_sampler_records_collapsed_stacks(self):
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        self.assertGreater(sum(sampler.stacks.values()), 0)
+        stack = sampler.stacks.most_common(1)[0][0]
+        self.assertIn(';RequestProfilerTests.test_sampler_records_collapsed_stacks (tasks/tests.py:', stack)
+
+    async def test_task_sampler_follows_the_request_into_sync_code(self):
+        def slow_query():
+            time.sleep(0.05)
+
+        async def view():
+            await sync_to_async(slow_query)()
+
+        task = asyncio.ensure_future(view())
+        sampler = TaskSampler(task, await sync_to_async(threading.get_ident)(), 0.001)
+        sampler.start()
+        await task
+        sampler.stop()
+        stack = sampler.stacks.most_common(1)[0][0]
+        self.assertRegex(stack, r'^RequestProfilerTests\.test_task_sampler_\w+\.<locals>\.view \(tasks/tests\.py:\d+\);')
+        self.assertIn('.<locals>.slow_query (tasks/tests.py:', stack)
+        self.assertNotIn('test_task_sampler_follows_the_request_into_sync_code (', stack)
+
+    async def test_async_views_are_profiled_under_asgi(self):
+        token = await sync_to_async(self.token)()
+        async_middleware = [
+            'tasks.profiling.RequestProfilerMiddleware',
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+            'django.contrib.messages.middleware.MessageMiddleware',
+        ]
+        # Below whitenoise's sync-only middleware, and with none at all
+        for middleware, expected in ((None, '(django/db/models/query.py:'),
+                                     (async_middleware, 'my_tasks (tasks/views.py:')):
+            with self.subTest(middleware=middleware), override_settings(PROFILE_INTERVAL=0.0002):
+                if middleware:
+                    self.enterContext(override_settings(MIDDLEWARE=middleware))
+                client = AsyncClient()
+                await client.aforce_login(self.user)
+                # A fast request may finish between samples on a busy machine
+                profiles = []
+                while len(profiles) < 5 and not any(expected in stacks for stacks in profiles):
+                    response = await client.get(reverse('tasks:user_tasks'), {'_profile': token})
+                    path = os.path.join(self.profile_dir, f"{response.headers['X-Profile']}.folded")
+                    with open(path, encoding='utf-8') as file:
+                        profiles.append(file.read())
+                self.assertIn(expected, profiles[-1])
+                for stacks in profiles:
+                    self.assertNotIn('BaseEventLoop.run_forever', stacks)
+
+    def test_token_profiles_the_request(self):
+        token = self.token()
+        response = self.client.get(reverse('tasks:user_tasks'), {'_profile': token})
+        name = response.headers['X-Profile']
+        with open(os.path.join(self.profile_dir, f'{name}.json'), encoding='utf-8') as file:
+            summary = json.load(file)
+        self.assertEqual(summary['view'], 'tasks:user_tasks')
+        self.assertEqual(summary['user'], 'alice')
+        self.assertEqual(summary['issued_by'], self.staff.pk)
+
+        response = self.client.get(reverse('tasks:calendar'), headers={'X-Profile-Token': token})
+        self.assertIn('X-Profile', response.headers)
+        self.assertEqual(self.client.get(reverse('profile-stacks', args=[name])).status_code, 403)
+
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(reverse('profiles')), f'{name}.folded')
+        stacks = b''.join(self.client.get(reverse('profile-stacks', args=[name])).streaming_content).decode()
+        for line in stacks.splitlines():
+            self.assertRegex(line, r'^\S.* \d+$')
+
+    def test_invalid_and_expired_tokens_are_ignored(self):
+        response = self.client.get(reverse('tasks:user_tasks'), {'_profile': 'forged'})
+        self.assertNotIn('X-Profile', response.headers)
+        token = self.token()
+        with override_settings(PROFILE_TOKEN_MAX_AGE=-1):
+            response = self.client.get(reverse('tasks:user_tasks'), {'_profile': token})
+        self.assertNotIn('X-Profile', response.headers)
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        token = self.token()
+        for _ in range(3):
+            self.client.get(reverse('tasks:user_tasks'), {'_profile': token})
+        self.assertEqual(len(os.listdir(self.profile_dir)), 4)
+
+    def test_profiling_off_removes_the_middleware(self):
+        token = self.token()
+        with override_settings(PROFILING=False):
+            response = self.client_class().get(reverse('home'), {'_profile': token})
+        self.assertNotIn('X-Profile', response.headers)
+        self.assertEqual(self.client.get(reverse('profiles')).status_code, 403)
+
+
+class QueryCountMixin:
+    """
+    Pins the number of queries each request runs, for a user with a few
+    tasks and for one with many, so a count that grows with the data (an
+    N+1 loop, a count() per item) fails. Caches are cleared before every
+    request: the counts are for a cold cache. They include the savepoints
+    the test transaction turns atomic() blocks into, and must stay within
+    the default QUERY_BUDGET so the budget follows what the views run. For
+    timings, run the bench command against seed_perf_data instead.
+    """
+    VOLUMES = (3, 60)
+
+    @staticmethod
+    def create_owner(username, task_count, **extra):
+        user = User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='pass12345', **extra,
+        )
+        categories = [Category.for_name(user, name) for name in ('Work', 'Home', 'Errands')]
+        today = date.today()
+        Task.objects.bulk_create(
+            Task(
+                user=user,
+                title=f'Task {i}',
+                description='Some details. ' * 20,
+                due_date=today + timedelta(days=i % 40 - 10),
+                priority=Task.Priority.values[i % 3],
+                status=Task.Status.values[i % 3],
+                is_completed=Task.Status.values[i % 3] == Task.Status.COMPLETED,
+                category=categories[i % 3],
+            )
+            for i in range(task_count)
+        )
+        rebuild_task_stats([user.pk])
+        return user
+
+    @staticmethod
+    def fetch(client, method, path, data, extra):
+        response = getattr(client, method)(path, data, **extra)
+        # Streaming responses query while they are consumed
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def assertRequestQueries(self, num, client, method, path, data=None, **extra):
+        self.assertLessEqual(num, settings.QUERY_BUDGET, f'{method.upper()} {path} is over the query budget')
+        cache.clear()
+        caches['templates'].clear()
+        with self.assertNumQueries(num):
+            return self.fetch(client, method, path, data, extra)
+
+
+class TaskViewQueryCountTests(QueryCountMixin, TestCase):
+    """Every URL in tasks/urls.py."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owners = {volume: cls.create_owner(f'owner{volume}', volume) for volume in cls.VOLUMES}
+        cls.today = timezone.now().date()
+        for owner in cls.owners.values():
+            Recurrence.objects.create(
+                user=owner, title='Stand-up', priority=Task.Priority.LOW,
+                frequency=Recurrence.Frequency.DAILY, starts_on=cls.today - timedelta(days=30),
+            )
+
+    def occurrence_url(self, name, owner, days):
+        recurrence = owner.task_recurrences.get()
+        return reverse(name, args=[recurrence.pk, (self.today + timedelta(days=days)).isoformat()])
+
+    def test_pages(self):
+        for volume, owner in self.owners.items():
+            self.client.force_login(owner)
+            task = Task.objects.filter(user=owner).first()
+            pages = [
+                ('tasks:create', {}, {}, 2),
+                ('tasks:user_tasks', {}, {}, 8),
+                ('tasks:user_tasks', {}, {'search': 'Task 1', 'status': 'todo'}, 5),
+                ('tasks:calendar', {}, {}, 6),
+                ('tasks:export', {}, {}, 3),
+                ('tasks:export', {}, {'format': 'ndjson'}, 3),
+                ('tasks:view', {'pk': task.pk}, {}, 5),
+                ('tasks:edit', {'pk': task.pk}, {}, 3),
+                ('tasks:api_list', {}, {}, 4),
+                ('tasks:api_detail', {'pk': task.pk}, {}, 4),
+            ]
+            for name, kwargs, query, num in pages:
+                with self.subTest(name=name, query=query, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'get', reverse(name, kwargs=kwargs), query,
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+            with self.subTest(name='tasks:occurrence', tasks=volume):
+                response = self.assertRequestQueries(
+                    4, self.client, 'get', self.occurrence_url('tasks:occurrence', owner, 1),
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_form_writes(self):
+        for volume, owner in self.owners.items():
+            self.client.force_login(owner)
+            task, other = Task.objects.filter(user=owner)[:2]
+            writes = [
+                ('tasks:create', {}, {
+                    'title': 'New', 'description': 'New task', 'due_date': '2030-01-15',
+                    'priority': 'high', 'status': 'todo', 'category': 'Work',
+                }, 5),
+                ('tasks:edit', {'pk': task.pk}, {
+                    'title': 'Edited', 'description': 'Edited task', 'due_date': '2030-01-16',
+                    'priority': 'low', 'status': 'in_progress', 'category': 'Garden',
+                }, 10),
+                ('tasks:complete', {'pk': task.pk}, {}, 6),
+                ('tasks:delete', {'pk': other.pk}, {}, 6),
+            ]
+            for name, kwargs, data, num in writes:
+                with self.subTest(name=name, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'post', reverse(name, kwargs=kwargs), data,
+                    )
+                    self.assertEqual(response.status_code, 302)
+
+            occurrence_writes = [
+                ('tasks:complete_occurrence', 2, 9),
+                ('tasks:skip_occurrence', 3, 7),
+                ('tasks:edit_occurrence', 4, 9),
+            ]
+            for name, days, num in occurrence_writes:
+                with self.subTest(name=name, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'post', self.occurrence_url(name, owner, days),
+                    )
+                    self.assertEqual(response.status_code, 302)
+
+            with self.subTest(name='tasks:delete_recurrence', tasks=volume):
+                url = reverse('tasks:delete_recurrence', args=[owner.task_recurrences.get().pk])
+                response = self.assertRequestQueries(6, self.client, 'post', url)
+                self.assertEqual(response.status_code, 302)
+
+    def test_api_writes(self):
+        for volume, owner in self.owners.items():
+            self.client.force_login(owner)
+            tasks = list(Task.objects.filter(user=owner)[:3])
+            url = reverse('tasks:api_detail', kwargs={'pk': tasks[0].pk})
+            with self.subTest(method='PATCH', tasks=volume):
+                response = self.assertRequestQueries(
+                    8, self.client, 'patch', url, json.dumps({'title': 'Patched', 'category': 'Home'}),
+                    content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 200)
+
+            # A bulk request's queries must not grow with its size either
+            size = min(volume, 20)
+            body = {
+                'create': [
+                    {'title': f'Bulk {i}', 'priority': 'low', 'status': 'todo',
+                     'due_date': '2030-02-01', 'category': f'Batch {i % 4}'}
+                    for i in range(size)
+                ],
+                'update': [{'id': task.pk, 'priority': 'high'} for task in tasks[1:]],
+            }
+            with self.subTest(method='POST bulk', tasks=volume):
+                response = self.assertRequestQueries(
+                    11, self.client, 'post', reverse('tasks:api_bulk'), json.dumps(body),
+                    content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 200)
+
+            with self.subTest(method='POST bulk delete', tasks=volume):
+                response = self.assertRequestQueries(
+                    9, self.client, 'post', reverse('tasks:api_bulk'),
+                    json.dumps({'delete': response.json()['created']}),
+                    content_type='application/json',
+                )
+                self.assertEqual(response.json()['deleted'], size)
+
+            with self.subTest(method='DELETE', tasks=volume):
+                response = self.assertRequestQueries(
+                    7, self.client, 'delete', url,
+                )
+                self.assertEqual(response.status_code, 204)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'tasks'
 
@@ -7,8 +7,17 @@ urlpatterns = [
     path('create/', views.createTask, name='create'),
     path('my-tasks/', views.my_tasks, name='user_tasks'),
     path('calendar/', views.calendar_view, name='calendar'),
+    path('export/', views.export_tasks, name='export'),
     path('<int:pk>/', views.view_task, name='view'),
     path('<int:pk>/edit/', views.edit_task, name='edit'),
     path('<int:pk>/delete/', views.delete_task, name='delete'),
     path('<int:pk>/complete/', views.complete_task, name='complete'),
+    path('repeat/<int:pk>/delete/', views.delete_recurrence, name='delete_recurrence'),
+    path('repeat/<int:pk>/<str:day>/', views.view_occurrence, name='occurrence'),
+    path('repeat/<int:pk>/<str:day>/complete/', views.complete_occurrence, name='complete_occurrence'),
+    path('repeat/<int:pk>/<str:day>/edit/', views.edit_occurrence, name='edit_occurrence'),
+    path('repeat/<int:pk>/<str:day>/skip/', views.skip_occurrence, name='skip_occurrence'),
+    path('api/tasks/', api.task_list, name='api_list'),
+    path('api/tasks/bulk/', api.task_bulk, name='api_bulk'),
+    path('api/tasks/<int:pk>/', api.task_detail, name='api_detail'),
 ]
\ No newline at end of file
@@ -1,10 +1,20 @@
-from django.shortcuts import get_object_or_404, redirect, render
-from .models import Task
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from .models import Category, Occurrence, Recurrence, Task
+from .calendar_grid import amonth_grid, with_occurrences
+from .export import EXPORT_FORMATS, export_response
+from .filters import filter_tasks, order_tasks
+from .http import conditional_page, task_page_etag, tasks_page_etag
+from .pagination import KeysetPaginator
+from .recurrence import UPCOMING_DAYS, aexpand, materialize, occurs_on, skip
+from .shortcuts import arender, aresolve_user
+from .stats import atask_stats, auser_task_stats
 from django.contrib import messages as message
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.http import Http404, HttpResponseBadRequest
+from django.utils import timezone
 import calendar
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 # Create your views here.
 
 @login_required(login_url='user:user-login')
@@ -17,16 +27,41 @@ def createTask(request):
         status = request.POST.get('status')
         catagory = request.POST.get('category')
         is_completed = bool(request.POST.get('is_completed'))
+        repeat = request.POST.get('repeat')
 
         try:
+            if repeat:
+                # A repeating task is stored once; see tasks.recurrence
+                interval = int(request.POST.get('repeat_interval') or 1)
+                starts_on = date.fromisoformat(due_date or '')
+                ends_on = request.POST.get('repeat_until')
+                ends_on = date.fromisoformat(ends_on) if ends_on else None
+                if interval < 1:
+                    raise ValueError("repeat every must be at least 1")
+                if ends_on and ends_on < starts_on:
+                    raise ValueError("the repeat end date is before the due date")
+                Recurrence.objects.create(
+                    user=request.user,
+                    title=title,
+                    description=description or '',
+                    priority=Task.Priority.from_key(priority or 'medium'),
+                    category=Category.for_name(request.user, catagory),
+                    frequency=Recurrence.Frequency.from_key(repeat),
+                    interval=interval,
+                    starts_on=starts_on,
+                    ends_on=ends_on,
+                )
+                message.success(request, "Repeating task created.")
+                return redirect('home')
+
             Task.objects.create(
                 user=request.user,  # Set the logged-in user as task owner
                 title=title,
                 description=description,
-                priority=priority,
+                priority=Task.Priority.from_key(priority or 'medium'),
                 due_date=due_date,
-                status=status,
-                category=catagory,
+                status=Task.Status.from_key(status or 'todo'),
+                category=Category.for_name(request.user, catagory),
                 is_completed=is_completed
             )
             message.success(request, "Task created successfully.")
@@ -41,45 +76,81 @@ def createTask(request):
 
 
 @login_required(login_url='user:user-login')
-def my_tasks(request):
-    user_tasks = Task.objects.filter(user=request.user).order_by('-created_at')
-    search_query = request.GET.get('search', '').strip()
-    
-    if search_query:
-        from django.db.models import Q
-        user_tasks = user_tasks.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__icontains=search_query)
-        )
-    
+@conditional_page(tasks_page_etag)
+async def my_tasks(request):
+    user = await aresolve_user(request)
+    user_tasks, search_query, status_filter = filter_tasks(user, request.GET)
+    # Unfiltered counts come from the user's TaskStats row
+    if search_query or status_filter:
+        stats = await atask_stats(user_tasks)
+    else:
+        stats = await auser_task_stats(user)
+
+    # Recurring tasks of the weeks around today, above the unfiltered first page
+    today = timezone.now().date()
+    occurrences = []
+    if not (search_query or status_filter or request.GET.get('after') or request.GET.get('before')):
+        window = timedelta(days=UPCOMING_DAYS)
+        occurrences = await aexpand(user.pk, today - window, today + window)
+
+    # Keyset pagination on (created_at, id) keeps deep pages as cheap as the first
+    page = await KeysetPaginator(order_tasks(user_tasks, search_query).select_related('category')).apage(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
     context = {
-        'tasks': user_tasks,
+        'tasks': page.object_list,
+        'page': page,
+        'occurrences': occurrences,
+        'today': today,
         'search_query': search_query,
-        'completed_count': user_tasks.filter(is_completed=True).count(),
-        'in_progress_count': user_tasks.filter(status='in_progress').count(),
-        'todo_count': user_tasks.filter(status='todo').count(),
+        'status_filter': status_filter,
+        'total_count': stats['total'],
+        'completed_count': stats['completed'],
+        'in_progress_count': stats['in_progress'],
+        'todo_count': stats['todo'],
     }
-    return render(request, 'tasks/user_tasks.html', context)
+    return await arender(request, 'tasks/user_tasks.html', context)
 
 
 @login_required(login_url='user:user-login')
-def view_task(request, pk):
-    task = get_object_or_404(Task, pk=pk, user=request.user)
-    return render(request, 'tasks/view_task.html', {'task': task})
+def export_tasks(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Unsupported export format.")
+
+    # Same search and status filters as the task list
+    user_tasks, search_query, _ = filter_tasks(request.user, request.GET)
+    return export_response(request, order_tasks(user_tasks, search_query), fmt, 'tasks')
+
+
+@login_required(login_url='user:user-login')
+@conditional_page(task_page_etag)
+async def view_task(request, pk):
+    user = await aresolve_user(request)
+    task = await aget_object_or_404(Task.objects.select_related('category'), pk=pk, user=user)
+    return await arender(request, 'tasks/view_task.html', {'task': task})
 
 
 @login_required(login_url='user:user-login')
 def edit_task(request, pk):
-    task = get_object_or_404(Task, pk=pk, user=request.user)
+    task = get_object_or_404(Task.objects.select_related('category'), pk=pk, user=request.user)
 
     if request.method == 'POST':
+        try:
+            priority = Task.Priority.from_key(request.POST.get('priority') or 'medium')
+            status = Task.Status.from_key(request.POST.get('status') or 'todo')
+        except ValueError as e:
+            message.error(request, f"Error updating task: {e}")
+            return render(request, 'tasks/create_task.html', {'task': task, 'is_edit': True})
+
         task.title = request.POST.get('title')
         task.description = request.POST.get('description')
-        task.priority = request.POST.get('priority')
+        task.priority = priority
         task.due_date = request.POST.get('due_date')
-        task.status = request.POST.get('status')
-        task.category = request.POST.get('category')
+        task.status = status
+        task.category = Category.for_name(request.user, request.POST.get('category'))
         task.is_completed = bool(request.POST.get('is_completed'))
         task.save()
         message.success(request, "Task updated successfully.")
@@ -103,7 +174,7 @@ def complete_task(request, pk):
     task = get_object_or_404(Task, pk=pk, user=request.user)
     if request.method == 'POST':
         task.is_completed = not task.is_completed
-        task.status = 'completed' if task.is_completed else 'todo'
+        task.status = Task.Status.COMPLETED if task.is_completed else Task.Status.TODO
         task.save()
         if task.is_completed:
             message.success(request, "Task marked as completed.")
@@ -113,7 +184,10 @@ def complete_task(request, pk):
 
 
 @login_required(login_url='user:user-login')
-def calendar_view(request):
+@conditional_page(tasks_page_etag)
+async def calendar_view(request):
+    user = await aresolve_user(request)
+
     # Get year and month from request or use current
     year = int(request.GET.get('year', datetime.now().year))
     month = int(request.GET.get('month', datetime.now().month))
@@ -126,26 +200,10 @@ def calendar_view(request):
         month = 12
         year -= 1
 
-    # Get calendar for the month
-    cal = calendar.monthcalendar(year, month)
-    
-    # Get all user tasks with due dates in this month
-    start_date = datetime(year, month, 1).date()
-    end_date = datetime(year, month, calendar.monthrange(year, month)[1]).date()
-    
-    user_tasks = Task.objects.filter(
-        user=request.user,
-        due_date__gte=start_date,
-        due_date__lte=end_date
-    ).order_by('due_date')
-    
-    # Create a dict of date -> list of tasks
-    tasks_by_date = {}
-    for task in user_tasks:
-        date_key = task.due_date.day
-        if date_key not in tasks_by_date:
-            tasks_by_date[date_key] = []
-        tasks_by_date[date_key].append(task)
+    # Get the month's grid: per-day counts and the first tasks of each day
+    grid = await amonth_grid(user.pk, year, month)
+    last_day = calendar.monthrange(year, month)[1]
+    grid = with_occurrences(grid, await aexpand(user.pk, date(year, month, 1), date(year, month, last_day)))
     
     # Get month/year names
     month_name = calendar.month_name[month]
@@ -164,11 +222,11 @@ def calendar_view(request):
         next_year += 1
     
     context = {
-        'calendar': cal,
+        'calendar': grid['weeks'],
+        'task_total': grid['total'],
         'year': year,
         'month': month,
         'month_name': month_name,
-        'tasks_by_date': tasks_by_date,
         'prev_year': prev_year,
         'prev_month': prev_month,
         'next_year': next_year,
@@ -176,4 +234,73 @@ def calendar_view(request):
         'weekdays': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
     }
     
-    return render(request, 'tasks/calendar.html', context)
\ No newline at end of file
+    return await arender(request, 'tasks/calendar.html', context)
+
+
+def _get_occurrence(request, pk, day):
+    recurrence = get_object_or_404(Recurrence.objects.select_related('category'), pk=pk, user=request.user)
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        raise Http404("Invalid date.")
+    if not occurs_on(recurrence, day):
+        raise Http404("The task does not repeat on that date.")
+    return recurrence, day
+
+
+@login_required(login_url='user:user-login')
+def view_occurrence(request, pk, day):
+    recurrence, day = _get_occurrence(request, pk, day)
+    written = Occurrence.objects.filter(recurrence=recurrence, date=day).first()
+    if written is not None:
+        if written.task_id is None:
+            raise Http404("This occurrence was skipped.")
+        return redirect('tasks:view', written.task_id)
+    return render(request, 'tasks/view_occurrence.html', {'recurrence': recurrence, 'date': day})
+
+
+@login_required(login_url='user:user-login')
+def complete_occurrence(request, pk, day):
+    recurrence, day = _get_occurrence(request, pk, day)
+    if request.method == 'POST':
+        task = materialize(recurrence, day, is_completed=True, status=Task.Status.COMPLETED)
+        if task is None:
+            message.error(request, "This occurrence was skipped.")
+        else:
+            if not task.is_completed:
+                # Edited earlier and still open
+                task.is_completed = True
+                task.status = Task.Status.COMPLETED
+                task.save()
+            message.success(request, "Task marked as completed.")
+    return redirect('tasks:user_tasks')
+
+
+@login_required(login_url='user:user-login')
+def edit_occurrence(request, pk, day):
+    recurrence, day = _get_occurrence(request, pk, day)
+    if request.method != 'POST':
+        return redirect('tasks:occurrence', recurrence.pk, day.isoformat())
+    task = materialize(recurrence, day)
+    if task is None:
+        raise Http404("This occurrence was skipped.")
+    # The occurrence is an ordinary task from now on
+    return redirect('tasks:edit', task.pk)
+
+
+@login_required(login_url='user:user-login')
+def skip_occurrence(request, pk, day):
+    recurrence, day = _get_occurrence(request, pk, day)
+    if request.method == 'POST':
+        skip(recurrence, day)
+        message.success(request, "Occurrence skipped.")
+    return redirect('tasks:user_tasks')
+
+
+@login_required(login_url='user:user-login')
+def delete_recurrence(request, pk):
+    recurrence = get_object_or_404(Recurrence, pk=pk, user=request.user)
+    if request.method == 'POST':
+        recurrence.delete()
+        message.success(request, "Repeating task deleted. Occurrences you completed or edited are kept.")
+    return redirect('tasks:user_tasks')
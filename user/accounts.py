@@ -0,0 +1,50 @@
+"""
+Username and email uniqueness for the account forms and email lookups for
+password resets.
+
+Emails are unique ignoring case: migration 0004 adds a unique index on
+``NULLIF(LOWER(email), '')``, so blank emails never clash. Lookups go through
+``EmailKey`` so they compile to the indexed expression instead of a scan.
+"""
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import ExpressionWrapper, Q, Value
+
+
+class EmailKey(models.Func):
+    """``NULLIF(LOWER(email), '')``, the indexed form of an email address."""
+    template = "NULLIF(LOWER(%(expressions)s), '')"
+    output_field = models.CharField()
+
+
+def users_by_email(email):
+    """Users whose email matches ``email`` ignoring case (at most one)."""
+    email = (email or '').strip()
+    if not email:
+        return User.objects.none()
+    return User.objects.alias(email_key=EmailKey('email')).filter(email_key=EmailKey(Value(email)))
+
+
+def taken_fields(username, email, exclude_id=None):
+    """
+    The fields (``'username'``, ``'email'``) another account already uses,
+    checked with one query. The database index still has the last word; save
+    inside ``transaction.atomic()`` and treat ``IntegrityError`` as a clash.
+    """
+    email = (email or '').strip()
+    checks = {'username': Q(username=username)}
+    if email:
+        checks['email'] = Q(email_key=EmailKey(Value(email)))
+    match = Q()
+    for check in checks.values():
+        match |= check
+    others = User.objects.alias(email_key=EmailKey('email')).filter(match)
+    if exclude_id is not None:
+        others = others.exclude(pk=exclude_id)
+
+    flags = [ExpressionWrapper(check, output_field=models.BooleanField()) for check in checks.values()]
+    taken = set()
+    # Both columns are unique, so at most two accounts match
+    for row in others.values_list(*flags)[:2]:
+        taken.update(field for field, hit in zip(checks, row) if hit)
+    return taken
@@ -1,4 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
+from .models import OutboundEmail
 # Register your models here.
 
+admin.site.register(OutboundEmail)
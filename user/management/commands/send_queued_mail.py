@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.outbox import deliver_due_mail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email, batching messages over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Messages sent per connection (default: 50).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the queue instead of exiting once it is drained.")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep between polls when idle with --loop (default: 5).")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total_sent = total_failed = 0
+
+        while True:
+            sent, failed = deliver_due_mail(batch_size=batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Queue drained: {total_sent} sent, {total_failed} failed."
+        ))
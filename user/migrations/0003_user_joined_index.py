@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+INDEX = models.Index(fields=['date_joined', 'id'], name='user_joined_idx')
+
+
+def add_index(apps, schema_editor):
+    # auth.User belongs to another app, so its index is managed by hand
+    schema_editor.add_index(apps.get_model('auth', 'User'), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user', '0002_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+from user.accounts import EmailKey
+
+CONSTRAINT = models.UniqueConstraint(EmailKey('email'), name='user_email_key_uniq')
+
+
+def add_constraint(apps, schema_editor):
+    # auth.User belongs to another app, so its constraint is managed by hand
+    User = apps.get_model('auth', 'User')
+    clashes = list(
+        User.objects.exclude(email='')
+        .annotate(email_key=EmailKey('email'))
+        .values('email_key')
+        .annotate(accounts=models.Count('id'))
+        .filter(accounts__gt=1)
+        .values_list('email_key', flat=True)
+    )
+    if clashes:
+        raise RuntimeError(
+            "These emails are used by more than one account (ignoring case); "
+            "change them before migrating: " + ', '.join(clashes)
+        )
+    schema_editor.add_constraint(User, CONSTRAINT)
+
+
+def remove_constraint(apps, schema_editor):
+    schema_editor.remove_constraint(apps.get_model('auth', 'User'), CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_user_joined_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_constraint, remove_constraint),
+    ]
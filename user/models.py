@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import random
 import string
 
@@ -21,4 +22,56 @@ class PasswordResetCode(models.Model):
         """Check if code is older than 15 minutes"""
         from django.utils import timezone
         from datetime import timedelta
-        return (timezone.now() - self.created_at) > timedelta(minutes=15)
\ No newline at end of file
+        return (timezone.now() - self.created_at) > timedelta(minutes=15)
+
+class OutboundEmail(models.Model):
+    """Mail waiting to be delivered by the send_queued_mail worker."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField(help_text="Comma-separated addresses")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "due pending mail" scan
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, subject, body, recipient_list, from_email=None):
+        """Queue a message instead of talking to the SMTP server in the request."""
+        from django.conf import settings
+        return cls.objects.create(
+            subject=subject,
+            body=body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=','.join(recipient_list),
+        )
+
+    def to_message(self, connection=None):
+        from django.core.mail import EmailMessage
+        return EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.recipients.split(','),
+            connection=connection,
+        )
@@ -0,0 +1,106 @@
+"""Delivery of queued OutboundEmail rows over one reused mail connection."""
+import logging
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# How long a claimed batch is hidden from other workers; longer than a
+# batch takes to send
+LEASE = timedelta(minutes=10)
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: 30s, 1m, 2m, 4m ... capped at an hour."""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def _record_failure(email, exc):
+    email.last_error = f'{type(exc).__name__}: {exc}'
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboundEmail.STATUS_FAILED
+        logger.error("Giving up on outbound email %s: %s", email.pk, email.last_error)
+    else:
+        email.next_attempt_at = timezone.now() + backoff(email.attempts)
+        logger.warning("Outbound email %s failed, will retry: %s", email.pk, email.last_error)
+
+
+def claim_due_mail(batch_size=50):
+    """
+    Lease up to ``batch_size`` due messages to the caller and return them.
+
+    The rows are locked (SKIP LOCKED where supported) only for the short
+    transaction that pushes their ``next_attempt_at`` one LEASE ahead, so
+    other workers skip them while they are sent and pick them up again if
+    this worker dies before recording a result.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        for email in batch:
+            email.attempts += 1
+            if email.attempts > MAX_ATTEMPTS:
+                # Every lease so far expired without a result
+                email.status = OutboundEmail.STATUS_FAILED
+                email.last_error = email.last_error or 'Lease expired before the message was sent'
+                logger.error("Giving up on outbound email %s: %s", email.pk, email.last_error)
+            else:
+                email.next_attempt_at = now + LEASE
+        OutboundEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+    return [email for email in batch if email.status == OutboundEmail.STATUS_PENDING]
+
+
+def deliver_due_mail(batch_size=50, connection=None):
+    """
+    Send up to ``batch_size`` due messages and return ``(sent, failed)``.
+
+    The batch is claimed with claim_due_mail(), so several workers can drain
+    the queue without sending a message twice and no row stays locked while
+    the SMTP server is talked to. Results are written once it is done.
+    """
+    sent = failed = 0
+
+    batch = claim_due_mail(batch_size)
+    if not batch:
+        return sent, failed
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # Server unreachable: the whole batch backs off together
+        for email in batch:
+            _record_failure(email, exc)
+        failed = len(batch)
+    else:
+        try:
+            for email in batch:
+                try:
+                    connection.send_messages([email.to_message(connection)])
+                except Exception as exc:
+                    failed += 1
+                    _record_failure(email, exc)
+                else:
+                    sent += 1
+                    email.status = OutboundEmail.STATUS_SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+        finally:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(batch, ['status', 'next_attempt_at', 'last_error', 'sent_at'])
+
+    return sent, failed
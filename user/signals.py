@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import forget_cached_user
+from .directory import invalidate_site_stats
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the user's cached copy (CachedModelBackend) on every change, and
+    the cached site totals when a user is added, removed or changes role.
+    """
+    forget_cached_user(instance.pk)
+
+    # Every login saves last_login alone; that changes no total
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_site_stats()
+
+
+@receiver(user_logged_out)
+def user_left(sender, request, user, **kwargs):
+    if user is not None:
+        forget_cached_user(user.pk)
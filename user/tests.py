@@ -1,3 +1,451 @@
-from django.test import TestCase
+import socketserver
+import threading
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.stats import rebuild_task_stats
+from tasks.tests import QueryCountMixin
+
+from .accounts import taken_fields, users_by_email
+from .models import OutboundEmail
+from .outbox import MAX_ATTEMPTS, claim_due_mail, deliver_due_mail
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: records messages, can refuse recipients."""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        recipients = []
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-stub')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 stub')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if address in server.refused:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk.decode())
+                server.messages.append((recipients, ''.join(data)))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubSMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.refused = set()
+
+
+class OutboundEmailTests(TestCase):
+
+    def setUp(self):
+        self.smtp = StubSMTPServer()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False,
+        )
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+
+    def test_forgot_password_only_enqueues(self):
+        User.objects.create_user(username='forgetful', email='forgetful@example.com', password='pass12345')
+        response = self.client.post(reverse('user:forgot-password'), {
+            'step': 'email',
+            'email': 'forgetful@example.com',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.smtp.connections, 0)
+
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipients, 'forgetful@example.com')
+        self.assertEqual(queued.status, OutboundEmail.STATUS_PENDING)
+
+    def test_worker_batches_over_one_connection(self):
+        for i in range(3):
+            OutboundEmail.enqueue(f'Message {i}', 'Body', [f'user{i}@example.com'])
+
+        call_command('send_queued_mail', stdout=StringIO())
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+
+    def test_failed_delivery_backs_off_and_retries(self):
+        self.smtp.refused.add('bounce@example.com')
+        bad = OutboundEmail.enqueue('Bad', 'Body', ['bounce@example.com'])
+        good = OutboundEmail.enqueue('Good', 'Body', ['ok@example.com'])
+
+        call_command('send_queued_mail', stdout=StringIO())
+
+        bad.refresh_from_db()
+        good.refresh_from_db()
+        self.assertEqual(good.status, OutboundEmail.STATUS_SENT)
+        self.assertEqual(bad.status, OutboundEmail.STATUS_PENDING)
+        self.assertEqual(bad.attempts, 1)
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertIn('SMTPRecipientsRefused', bad.last_error)
+
+        # Once the backoff has elapsed the message goes out
+        self.smtp.refused.clear()
+        OutboundEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        call_command('send_queued_mail', stdout=StringIO())
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, OutboundEmail.STATUS_SENT)
+        self.assertEqual(bad.attempts, 2)
+
+    def test_claimed_mail_is_leased_to_one_worker(self):
+        email = OutboundEmail.enqueue('Hello', 'Body', ['ok@example.com'])
+        self.assertEqual(claim_due_mail(), [email])
+        # Another worker polling during the send finds nothing due
+        self.assertEqual(claim_due_mail(), [])
+        self.assertEqual(deliver_due_mail(), (0, 0))
+
+        # The worker died: the message goes out once the lease runs out
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_due_mail(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_SENT, 2))
+
+    def test_mail_whose_leases_keep_expiring_is_given_up(self):
+        email = OutboundEmail.enqueue('Hello', 'Body', ['ok@example.com'])
+        OutboundEmail.objects.filter(pk=email.pk).update(attempts=MAX_ATTEMPTS)
+        self.assertEqual(deliver_due_mail(), (0, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_FAILED)
+        self.assertEqual(len(self.smtp.messages), 0)
+
+
+class AdminDirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='root', password='pass12345', email='root@example.com')
+        users = User.objects.bulk_create([
+            User(username=f'member{i:02d}', email=f'member{i:02d}@example.com') for i in range(40)
+        ])
+        Task.objects.bulk_create([
+            Task(user=users[0], title=f'Task {i}', description='', priority=Task.Priority.LOW,
+                 due_date=timezone.now().date(), status=Task.Status.TODO, is_completed=i < 2)
+            for i in range(5)
+        ])
+        # bulk_create skips the signals that maintain TaskStats
+        rebuild_task_stats([user.pk for user in users])
+        cls.busy = users[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def get_directory(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('user:admin-profile'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_pages_with_task_counts_in_constant_queries(self):
+        response, cold_queries = self.get_directory()
+        self.assertEqual(len(response.context['users']), 25)
+        self.assertEqual(response.context['total_users'], 41)
+        self.assertEqual(response.context['total_tasks'], 5)
+
+        response, warm_queries = self.get_directory(after=response.context['page'].next_cursor)
+        self.assertEqual(len(response.context['users']), 16)
+        # Session, user and the page itself; site totals come from the cache
+        self.assertEqual(warm_queries, 3)
+        self.assertLess(warm_queries, cold_queries)
+
+    def test_search_and_role_filters(self):
+        response, _ = self.get_directory(search='member00')
+        row = response.context['users'][0]
+        self.assertEqual((row, row.task_count, row.completed_task_count), (self.busy, 5, 2))
+
+        response, _ = self.get_directory(role='admin')
+        self.assertEqual(list(response.context['users']), [self.admin])
+
+    def test_new_users_refresh_cached_totals(self):
+        self.get_directory()
+        User.objects.create_user(username='newcomer', password='pass12345')
+        self.assertEqual(self.get_directory()[0].context['total_users'], 42)
+
+
+class EmailUniquenessTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='Alice@Example.com', password='pass12345')
+
+    def test_database_rejects_emails_differing_only_in_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='alice2', email='alice@example.COM')
+
+    def test_blank_emails_do_not_clash(self):
+        User.objects.create_user(username='noemail1')
+        User.objects.create_user(username='noemail2')
+        self.assertEqual(taken_fields('noemail3', ''), set())
+
+    def test_taken_fields_uses_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(taken_fields('alice', 'ALICE@example.com'), {'username', 'email'})
+        with self.assertNumQueries(1):
+            self.assertEqual(taken_fields('bob', 'alice@example.com'), {'email'})
+        self.assertEqual(taken_fields('alice', 'alice@example.com', exclude_id=self.user.pk), set())
+
+    def test_register_refuses_an_email_in_another_case(self):
+        response = self.client.post(reverse('user:user-register'), {
+            'first_name': '', 'last_name': '', 'username': 'bob', 'email': 'ALICE@example.com',
+            'password1': 'pass12345', 'password2': 'pass12345',
+        })
+        self.assertContains(response, 'Email already registered.')
+        self.assertFalse(User.objects.filter(username='bob').exists())
+
+    def test_password_reset_finds_the_email_in_any_case(self):
+        self.client.post(reverse('user:forgot-password'), {'step': 'email', 'email': 'alice@example.com'})
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    @skipUnlessDBFeature('supports_expression_indexes')
+    def test_email_lookup_uses_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plan format differs per database")
+        self.assertIn('user_email_key_uniq', users_by_email('alice@example.com').explain())
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class CachedAuthTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        cls.staff = User.objects.create_user(username='boss', password='pass12345', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def signed_in(self, user):
+        client = self.client_class()
+        client.force_login(user)
+        # The first request fills the caches
+        client.get(reverse('tasks:create'))
+        return client
+
+    def test_signed_in_pages_need_no_session_or_user_query(self):
+        client = self.signed_in(self.user)
+        with self.assertNumQueries(0):
+            response = client.get(reverse('tasks:create'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_keeps_this_session_and_ends_the_others(self):
+        client, other = self.signed_in(self.user), self.signed_in(self.user)
+        client.post(reverse('user:update-password'), {
+            'old_password': 'pass12345', 'new_password': 'pass67890', 'confirm_password': 'pass67890',
+        })
+        self.assertEqual(client.get(reverse('tasks:create')).status_code, 200)
+        self.assertEqual(other.get(reverse('tasks:create')).status_code, 302)
+
+    def test_admin_edits_show_on_the_next_request(self):
+        client = self.signed_in(self.user)
+        admin = self.signed_in(self.staff)
+        admin.post(reverse('user:admin-edit-user', args=[self.user.pk]), {
+            'username': 'alice2', 'email': 'alice@example.com', 'first_name': '', 'last_name': '',
+        })
+        response = client.get(reverse('tasks:create'))
+        self.assertEqual(response.wsgi_request.user.username, 'alice2')
+
+    def test_logout_ends_the_cached_session(self):
+        client = self.signed_in(self.user)
+        cookies = client.cookies
+        client.get(reverse('user:user-logout'))
+
+        stale = self.client_class()
+        stale.cookies = cookies
+        self.assertEqual(stale.get(reverse('tasks:create')).status_code, 302)
+
+    def test_deleted_account_ends_every_session(self):
+        client, other = self.signed_in(self.user), self.signed_in(self.user)
+        client.post(reverse('user:delete-account'), {'password': 'pass12345'})
+        self.assertEqual(other.get(reverse('tasks:create')).status_code, 302)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        client = self.signed_in(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(reverse('tasks:create')).status_code, 200)
+        client.get(reverse('user:user-logout'))
+        self.assertEqual(client.get(reverse('tasks:create')).status_code, 302)
+
+
+class UserViewQueryCountTests(QueryCountMixin, TestCase):
+    """Every URL in user/urls.py."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owners = {volume: cls.create_owner(f'owner{volume}', volume) for volume in cls.VOLUMES}
+        cls.staff = User.objects.create_user(username='boss', email='boss@example.com', password='pass12345', is_staff=True)
+
+    def test_pages(self):
+        for volume, owner in self.owners.items():
+            self.client.force_login(owner)
+            for name, num in (
+                ('user:user-profile', 4),
+                ('user:edit_profile', 3),
+                ('user:user-dashboard', 6),
+                ('user:settings', 4),
+                ('user:change-password', 2),
+            ):
+                with self.subTest(name=name, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'get', reverse(name),
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+        anonymous = self.client_class()
+        for name in ('user:user-register', 'user:user-login', 'user:forgot-password'):
+            with self.subTest(name=name):
+                response = self.assertRequestQueries(
+                    0, anonymous, 'get', reverse(name),
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_pages(self):
+        self.client.force_login(self.staff)
+        for volume, owner in self.owners.items():
+            for name, query, num in (
+                ('user:user-tasks', {}, 6),
+                ('user:user-tasks', {'search': 'Task 1', 'status': 'completed'}, 6),
+                ('user:export-user-tasks', {}, 4),
+            ):
+                with self.subTest(name=name, query=query, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'get', reverse(name, kwargs={'user_id': owner.pk}), query,
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_admin_directory_as_users_grow(self):
+        self.client.force_login(self.staff)
+        for volume in self.VOLUMES:
+            # Grow the directory to `volume` more members, each with tasks
+            members = User.objects.bulk_create(
+                User(username=f'member{volume}-{i}', email=f'member{volume}-{i}@example.com') for i in range(volume)
+            )
+            Task.objects.bulk_create(
+                Task(user=member, title='Chore', description='', due_date=timezone.now().date(), is_completed=i % 2 == 0)
+                for i, member in enumerate(members)
+            )
+            rebuild_task_stats([member.pk for member in members])
+            with self.subTest(users=volume):
+                response = self.assertRequestQueries(
+                    5, self.client, 'get', reverse('user:admin-profile'),
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_account_writes(self):
+        for volume, owner in self.owners.items():
+            self.client.force_login(owner)
+            # Profile saves run in a savepoint, 2 queries under the test transaction
+            writes = [
+                ('user:edit_profile', {
+                    'first_name': 'Ada', 'last_name': 'Owner', 'username': owner.username, 'email': owner.email,
+                }, 7),
+                ('user:update-profile', {
+                    'first_name': 'Ada', 'last_name': 'Owner', 'username': owner.username, 'email': owner.email,
+                }, 6),
+                ('user:update-password', {
+                    'old_password': 'pass12345', 'new_password': 'pass67890', 'confirm_password': 'pass67890',
+                }, 12),
+                ('user:delete-account', {'password': 'pass67890'}, 18),
+            ]
+            for name, data, num in writes:
+                with self.subTest(name=name, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'post', reverse(name), data,
+                    )
+                    self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.filter(pk__in=[owner.pk for owner in self.owners.values()]).exists())
+
+    def test_sign_in_flow(self):
+        client = self.client_class()
+        for name, data, num in (
+            ('user:user-register', {
+                'first_name': 'New', 'last_name': 'User', 'username': 'newuser', 'email': 'new@example.com',
+                'password1': 'pass12345', 'password2': 'pass12345',
+            }, 8),
+            ('user:user-login', {'username': 'newuser', 'password': 'pass12345'}, 9),
+            ('user:user-logout', {}, 4),
+            ('user:forgot-password', {'step': 'email', 'email': 'new@example.com'}, 4),
+        ):
+            with self.subTest(name=name):
+                response = self.assertRequestQueries(num, client, 'post', reverse(name), data)
+                self.assertIn(response.status_code, (200, 302))
+
+    def test_admin_writes(self):
+        self.client.force_login(self.staff)
+        for volume in self.VOLUMES:
+            # A user with `volume` tasks, edited and then deleted
+            user = self.create_owner(f'managed{volume}', volume)
+            for name, data, num in (
+                ('user:admin-create-user', {
+                    'username': f'created{volume}', 'email': f'created{volume}@example.com', 'password': 'pass12345',
+                }, 10),
+                ('user:admin-edit-user', {
+                    'username': user.username, 'email': user.email, 'first_name': 'Managed', 'last_name': 'User',
+                }, 7),
+                ('user:admin-change-password', {'new_password': 'pass67890', 'confirm_password': 'pass67890'}, 4),
+                ('user:admin-delete-user', {}, 17),
+            ):
+                kwargs = {} if name == 'user:admin-create-user' else {'user_id': user.pk}
+                with self.subTest(name=name, tasks=volume):
+                    response = self.assertRequestQueries(
+                        num, self.client, 'post', reverse(name, kwargs=kwargs), data,
+                    )
+                    self.assertEqual(response.status_code, 302)
+            self.assertFalse(User.objects.filter(pk=user.pk).exists())
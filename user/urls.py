@@ -27,4 +27,5 @@ urlpatterns = [
     path('admin/password/<int:user_id>/', views.admin_change_password, name='admin-change-password'),
     path('admin/delete/<int:user_id>/', views.admin_delete_user, name='admin-delete-user'),
     path('admin/tasks/<int:user_id>/', views.user_tasks, name='user-tasks'),
+    path('admin/tasks/<int:user_id>/export/', views.export_user_tasks, name='export-user-tasks'),
 ]
\ No newline at end of file
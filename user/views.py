@@ -5,12 +5,18 @@ from django.contrib.auth import authenticate, logout as auth_logout, login as au
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect as django_redirect
-from django.http import HttpResponseForbidden
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import PasswordResetCode
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseBadRequest, HttpResponseForbidden
+from .accounts import taken_fields, users_by_email
+from .directory import filter_users, site_stats, with_task_counts
+from .models import OutboundEmail, PasswordResetCode
+from tasks.export import EXPORT_FORMATS, export_response
+from tasks.filters import filter_tasks, order_tasks
+from tasks.http import conditional_page, tasks_page_etag
 from tasks.models import Task
-from datetime import datetime, timedelta
+from tasks.pagination import KeysetPaginator
+from tasks.shortcuts import arender, aresolve_user
+from tasks.stats import auser_task_stats, user_task_stats
     
 
 # Create your views here.
@@ -43,22 +49,28 @@ def register(request):
             message.error(request, "Passwords do not match.")
             return render(request, 'user/register.html', {'form_values': form_values})
 
-        elif User.objects.filter(username=username).exists():
+        taken = taken_fields(username, email)
+        if 'username' in taken:
             message.error(request, "Username already taken.")
             return render(request, 'user/register.html', {'form_values': form_values})
 
-        elif User.objects.filter(email=email).exists():
+        elif 'email' in taken:
             message.error(request, "Email already registered.")
             return render(request, 'user/register.html', {'form_values': form_values})
         else:
-            user = User.objects.create_user(
-                username=username,
-                password=password1,
-                email=email,
-                first_name=fname,
-                last_name=lname
-            )
-            user.save()
+            try:
+                # The unique indexes catch a sign-up racing this one
+                with transaction.atomic():
+                    User.objects.create_user(
+                        username=username,
+                        password=password1,
+                        email=email,
+                        first_name=fname,
+                        last_name=lname
+                    )
+            except IntegrityError:
+                message.error(request, "Username or email already taken.")
+                return render(request, 'user/register.html', {'form_values': form_values})
             message.success(request, "Registration successful. You can now log in.")
             return redirect('user:user-login')
 
@@ -96,11 +108,12 @@ def edit_profile(request):
             if password1 != password2:
                 message.error(request, "Passwords do not match.")
                 return render(request, 'user/register.html', {'is_edit': True, 'form_values': form_values})
-        if User.objects.filter(username=username).exclude(id=user.id).exists():
+        taken = taken_fields(username, email, exclude_id=user.id)
+        if 'username' in taken:
             message.error(request, "Username already taken.")
             return render(request, 'user/register.html', {'is_edit': True, 'form_values': form_values})
 
-        if User.objects.filter(email=email).exclude(id=user.id).exists():
+        if 'email' in taken:
             message.error(request, "Email already registered.")
             return render(request, 'user/register.html', {'is_edit': True, 'form_values': form_values})
 
@@ -111,11 +124,15 @@ def edit_profile(request):
 
         if password1 and password1 == password2:
             user.set_password(password1)
-            user.save()
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            message.error(request, "Username or email already taken.")
+            return render(request, 'user/register.html', {'is_edit': True, 'form_values': form_values})
+        if password1 and password1 == password2:
             # keep user logged in after password change
             update_session_auth_hash(request, user)
-        else:
-            user.save()
 
         message.success(request, "Profile updated successfully.")
         return redirect('user:user-profile')
@@ -157,25 +174,13 @@ def logout(request):
 
 @login_required(login_url='user:user-login')
 def profile(request):
-    # Get user's tasks
-    user_tasks = Task.objects.filter(user=request.user)
-    
-    # Calculate stats
-    task_count = user_tasks.count()
-    completed_count = user_tasks.filter(is_completed=True).count()
-    
-    # Get upcoming tasks (due within next 7 days)
-    today = datetime.now().date()
-    upcoming_count = user_tasks.filter(
-        due_date__gte=today,
-        due_date__lte=today + timedelta(days=7),
-        is_completed=False
-    ).count()
+    # Get user's task stats
+    stats = user_task_stats(request.user)
     
     context = {
-        'task_count': task_count,
-        'completed_count': completed_count,
-        'upcoming_count': upcoming_count,
+        'task_count': stats['total'],
+        'completed_count': stats['completed'],
+        'upcoming_count': stats['upcoming'],
     }
     
     return render(request, 'user/profile.html', context)
@@ -188,27 +193,19 @@ def admin_profile(request):
         message.error(request, "You do not have permission to access this page.")
         return redirect('user:user-profile')
     
-    # Get all users
-    users = User.objects.all().order_by('-date_joined')
-    
-    # Calculate stats
-    total_users = users.count()
-    active_users = users.filter(is_active=True).count()
-    admin_count = users.filter(is_staff=True).count()
-    
-    # Get total tasks count (will be 0 if tasks app not configured yet)
-    try:
-        from tasks.models import Task
-        total_tasks = Task.objects.count()
-    except:
-        total_tasks = 0
+    # Get one keyset page of the directory, with each user's task counts
+    users, search_query, role_filter = filter_users(User.objects.all(), request.GET)
+    page = KeysetPaginator(with_task_counts(users), ordering=('-date_joined', '-id'), per_page=25).page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
     context = {
-        'users': users,
-        'total_users': total_users,
-        'active_users': active_users,
-        'admin_count': admin_count,
-        'total_tasks': total_tasks,
+        'users': page.object_list,
+        'page': page,
+        'search_query': search_query,
+        'role_filter': role_filter,
+        **site_stats(),
     }
     return render(request, 'user/admin_profile.html', context)
 
@@ -227,21 +224,24 @@ def admin_create_user(request):
         is_staff = request.POST.get('is_staff') == 'on'
         
         try:
-            if User.objects.filter(username=username).exists():
+            taken = taken_fields(username, email)
+            if 'username' in taken:
                 message.error(request, f"Username '{username}' already exists.")
-            elif User.objects.filter(email=email).exists():
+            elif 'email' in taken:
                 message.error(request, f"Email '{email}' is already registered.")
             else:
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password=password,
-                    first_name=first_name,
-                    last_name=last_name
-                )
-                user.is_staff = is_staff
-                user.save()
+                with transaction.atomic():
+                    User.objects.create_user(
+                        username=username,
+                        email=email,
+                        password=password,
+                        first_name=first_name,
+                        last_name=last_name,
+                        is_staff=is_staff,
+                    )
                 message.success(request, f"User '{username}' created successfully.")
+        except IntegrityError:
+            message.error(request, f"Username '{username}' or email '{email}' is already in use.")
         except Exception as e:
             message.error(request, f"Error creating user: {str(e)}")
     
@@ -262,19 +262,22 @@ def admin_edit_user(request, user_id):
         last_name = request.POST.get('last_name', '')
         
         try:
-            # Check if username is taken by another user
-            if User.objects.filter(username=username).exclude(id=user_id).exists():
+            # Check whether another user has the username or email
+            taken = taken_fields(username, email, exclude_id=user_id)
+            if 'username' in taken:
                 message.error(request, f"Username '{username}' is already taken.")
-            # Check if email is taken by another user
-            elif User.objects.filter(email=email).exclude(id=user_id).exists():
+            elif 'email' in taken:
                 message.error(request, f"Email '{email}' is already registered.")
             else:
                 user.username = username
                 user.email = email
                 user.first_name = first_name
                 user.last_name = last_name
-                user.save()
+                with transaction.atomic():
+                    user.save()
                 message.success(request, f"User '{username}' updated successfully.")
+        except IntegrityError:
+            message.error(request, f"Username '{username}' or email '{email}' is already in use.")
         except Exception as e:
             message.error(request, f"Error updating user: {str(e)}")
     
@@ -337,20 +340,38 @@ def user_tasks(request, user_id):
     
     user = get_object_or_404(User, id=user_id)
     
-    # Get tasks for this user (will handle if tasks app not configured)
-    try:
-        from tasks.models import Task
-        tasks = Task.objects.filter(user=user).order_by('-created_at')
-    except:
-        tasks = []
+    # Get tasks for this user, one keyset page at a time
+    user_tasks, search_query, status_filter = filter_tasks(user, request.GET)
+    stats = user_task_stats(user)
+    page = KeysetPaginator(order_tasks(user_tasks, search_query)).page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
     context = {
         'profile_user': user,
-        'tasks': tasks,
+        'tasks': page.object_list,
+        'page': page,
+        'search_query': search_query,
+        'status_filter': status_filter,
+        'stats': stats,
     }
     return render(request, 'user/user_tasks.html', context)
 
 
+@login_required(login_url='user:user-login')
+def export_user_tasks(request, user_id):
+    if not (request.user.is_staff or request.user.is_superuser):
+        return HttpResponseForbidden("You do not have permission to view this page.")
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Unsupported export format.")
+
+    user = get_object_or_404(User, id=user_id)
+    user_tasks, search_query, _ = filter_tasks(user, request.GET)
+    return export_response(request, order_tasks(user_tasks, search_query), fmt, f'{user.username}-tasks')
+
 
 def forgot_password(request):
     """Handle password reset with email verification"""
@@ -361,7 +382,7 @@ def forgot_password(request):
         if step == 'email':
             email = request.POST.get('email')
             try:
-                user = User.objects.get(email=email)
+                user = users_by_email(email).get()
                 
                 # Generate and save reset code
                 reset_code = PasswordResetCode.objects.filter(user=user).first()
@@ -372,7 +393,7 @@ def forgot_password(request):
                 reset_code.is_used = False
                 reset_code.save()
                 
-                # Send email with code
+                # Email the code
                 subject = 'Password Reset Code - Task Manager'
                 message_body = f"""
 Hello {user.first_name or user.username},
@@ -389,13 +410,8 @@ Best regards,
 Task Manager Team
                 """
                 
-                send_mail(
-                    subject,
-                    message_body,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [email],
-                    fail_silently=False,
-                )
+                # Queue the email; send_queued_mail delivers it outside the request
+                OutboundEmail.enqueue(subject, message_body, [email])
                 
                 message.success(request, f"Reset code sent to {email}")
                 return render(request, 'user/forget_password.html', {
@@ -414,7 +430,7 @@ Task Manager Team
             reset_code_input = request.POST.get('reset_code')
             
             try:
-                user = User.objects.get(email=email)
+                user = users_by_email(email).get()
                 reset_code = PasswordResetCode.objects.get(user=user)
                 
                 # Check if code is valid
@@ -469,7 +485,7 @@ Task Manager Team
                 })
             
             try:
-                user = User.objects.get(email=email)
+                user = users_by_email(email).get()
                 reset_code = PasswordResetCode.objects.get(user=user)
                 
                 # Check if code is still valid
@@ -500,17 +516,16 @@ Task Manager Team
 
 
 @login_required(login_url='user:user-login')
-def dashboard(request):
+@conditional_page(tasks_page_etag)
+async def dashboard(request):
     """Dashboard view with task statistics and filtering."""
-    from tasks.models import Task
-    from django.db.models import Q
-    from django.utils import timezone
+    user = await aresolve_user(request)
     
     # Get filter parameter
     filter_type = request.GET.get('filter', 'all')
     
     # Get all tasks for the logged-in user
-    all_tasks = Task.objects.filter(user=request.user).order_by('-created_at')
+    all_tasks = Task.objects.filter(user=user).order_by('-created_at', '-id')
     
     # Apply filter
     if filter_type == 'pending':
@@ -521,16 +536,9 @@ def dashboard(request):
         tasks = all_tasks
     
     # Calculate statistics
-    total_tasks = all_tasks.count()
-    completed_tasks = all_tasks.filter(is_completed=True).count()
-    pending_tasks = all_tasks.filter(is_completed=False).count()
-    
-    # Count overdue tasks (due_date < today and not completed)
-    today = timezone.now().date()
-    overdue_tasks = all_tasks.filter(
-        due_date__lt=today,
-        is_completed=False
-    ).count()
+    stats = await auser_task_stats(user)
+    total_tasks = stats['total']
+    completed_tasks = stats['completed']
     
     # Calculate completion rate
     completion_rate = 0
@@ -538,16 +546,16 @@ def dashboard(request):
         completion_rate = round((completed_tasks / total_tasks) * 100)
     
     context = {
-        'tasks': tasks[:10],  # Limit to 10 most recent tasks
+        'tasks': [task async for task in tasks[:10]],  # Limit to 10 most recent tasks
         'total_tasks': total_tasks,
         'completed_tasks': completed_tasks,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': overdue_tasks,
+        'pending_tasks': stats['pending'],
+        'overdue_tasks': stats['overdue'],
         'completion_rate': completion_rate,
         'filter': filter_type,
     }
     
-    return render(request, 'user/dashboard.html', context)
+    return await arender(request, 'user/dashboard.html', context)
 
 
 @login_required(login_url='user:user-login')
@@ -556,15 +564,12 @@ def settings(request):
     user = request.user
     
     # Get user's task statistics
-    from tasks.models import Task
-    user_tasks = Task.objects.filter(user=user)
-    total_tasks = user_tasks.count()
-    completed_tasks = user_tasks.filter(is_completed=True).count()
+    stats = user_task_stats(user)
     
     context = {
         'user': user,
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
+        'total_tasks': stats['total'],
+        'completed_tasks': stats['completed'],
     }
     
     return render(request, 'user/settings.html', context)
@@ -581,13 +586,13 @@ def update_profile(request):
         email = request.POST.get('email', '').strip()
         username = request.POST.get('username', '').strip()
         
-        # Validate username uniqueness
-        if User.objects.filter(username=username).exclude(id=user.id).exists():
+        # Validate username and email uniqueness
+        taken = taken_fields(username, email, exclude_id=user.id)
+        if 'username' in taken:
             message.error(request, "Username already taken.")
             return redirect('user:settings')
         
-        # Validate email uniqueness
-        if User.objects.filter(email=email).exclude(id=user.id).exists():
+        if 'email' in taken:
             message.error(request, "Email already registered.")
             return redirect('user:settings')
         
@@ -596,7 +601,12 @@ def update_profile(request):
         user.last_name = last_name
         user.email = email
         user.username = username
-        user.save()
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            message.error(request, "Username or email already taken.")
+            return redirect('user:settings')
         
         message.success(request, "Profile updated successfully.")
         return redirect('user:settings')